@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up. Live product updates are served next to
+# Django rather than through it; see store/streams.py.
+from store.streams import EventStreamRouter  # noqa: E402
+
+application = EventStreamRouter(django_application)
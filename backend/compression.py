@@ -0,0 +1,105 @@
+import zlib
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only without it
+    brotli = None
+
+
+# Response compression for the API, negotiated from Accept-Encoding.
+#
+# Only the API's own payload types are compressed. HTML (the admin and the
+# browsable API) is left alone: it carries CSRF tokens, and compressing
+# secrets next to attacker-influenced text is what BREACH exploits. Static
+# files never get here; WhiteNoise serves them precompressed before this
+# middleware runs.
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/csv", "text/plain")
+
+
+class GzipEncoder:
+    name = "gzip"
+
+    def __init__(self):
+        # wbits=31: a gzip header and trailer around the deflate stream.
+        self.compressor = zlib.compressobj(getattr(settings, "STORE_GZIP_LEVEL", 6), zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush()
+
+
+class BrotliEncoder:
+    name = "br"
+
+    def __init__(self):
+        # Quality 4 or so is the usual choice for dynamic responses: close
+        # to gzip's speed, noticeably smaller output.
+        self.compressor = brotli.Compressor(quality=getattr(settings, "STORE_BROTLI_QUALITY", 4))
+
+    def compress(self, data):
+        return self.compressor.process(data) + self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+ENCODERS = {"br": BrotliEncoder, "gzip": GzipEncoder}
+
+
+def available_encodings():
+    """STORE_COMPRESSION_ENCODINGS in order of preference, minus missing libraries."""
+    return [
+        name
+        for name in getattr(settings, "STORE_COMPRESSION_ENCODINGS", ("br", "gzip"))
+        if name in ENCODERS and (name != "br" or brotli is not None)
+    ]
+
+
+def negotiate(accept_encoding, offered):
+    """The offered encoding the client weights highest; our order breaks ties."""
+    weights = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if token:
+            weights[token.strip().lower()] = q
+    best, best_q = None, 0.0
+    for name in offered:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def compressible(response):
+    # Only full 200 bodies: a 206's Content-Range counts uncompressed bytes.
+    if response.status_code != 200 or response.has_header("Content-Range"):
+        return False
+    content_type = response.get("Content-Type", "").split(";")[0].strip().lower()
+    return content_type in COMPRESSIBLE_TYPES and not response.has_header("Content-Encoding")
+
+
+def compress_stream(encoder, chunks):
+    for chunk in chunks:
+        if data := encoder.compress(chunk):
+            yield data
+    yield encoder.finish()
+
+
+async def acompress_stream(encoder, chunks):
+    async for chunk in chunks:
+        if data := encoder.compress(chunk):
+            yield data
+    yield encoder.finish()
@@ -0,0 +1,155 @@
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from store.storage import HASHED_NAME_RE
+
+
+# Production media serving for MEDIA_ROOT.
+#
+# Compared to django.views.static.serve this adds ETag/If-None-Match, single
+# HTTP ranges (for seeking and resumable downloads), long-lived immutable
+# caching for content-hashed names, and an offload mode where the front
+# proxy sends the file: MEDIA_SENDFILE_MODE = "x-sendfile" (Apache,
+# lighttpd) or "x-accel-redirect" (nginx, with MEDIA_ACCEL_REDIRECT_PREFIX
+# mapped to MEDIA_ROOT as an internal location).
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+CHUNK_SIZE = 64 * 1024
+
+
+def file_etag(stat):
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def cache_policy(path):
+    if HASHED_NAME_RE.search(path):
+        return {"public": True, "max_age": getattr(settings, "MEDIA_IMMUTABLE_MAX_AGE", 31536000), "immutable": True}
+    return {"public": True, "max_age": getattr(settings, "MEDIA_MAX_AGE", 3600)}
+
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single satisfiable range, None to ignore, or "unsatisfiable"."""
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        # Malformed or multi-range: serving the whole file is allowed.
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            return "unsatisfiable"
+        return max(0, size - length), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        # Invalid rather than unsatisfiable (RFC 9110 14.1.1): ignore it.
+        return None
+    if start >= size:
+        return "unsatisfiable"
+    end = min(int(last), size - 1) if last else size - 1
+    return start, end
+
+
+def iter_range(path, start, length):
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = fh.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def validators_match(request, etag, mtime):
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    since = parse_http_date_safe(request.META.get("HTTP_IF_MODIFIED_SINCE", ""))
+    return since is not None and int(mtime) <= since
+
+
+def if_range_allows(request, etag, mtime):
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    date = parse_http_date_safe(if_range)
+    return date is not None and int(mtime) <= date
+
+
+@require_safe
+def serve_media(request, path):
+    document_root = str(settings.MEDIA_ROOT)
+    path = posixpath.normpath(path).lstrip("/")
+    try:
+        fullpath = safe_join(document_root, path)
+        stat = os.stat(fullpath)
+    except (SuspiciousFileOperation, ValueError, OSError):
+        raise Http404("File not found.")
+    if not os.path.isfile(fullpath):
+        raise Http404("File not found.")
+
+    etag = file_etag(stat)
+    policy = cache_policy(path)
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    content_type = content_type or "application/octet-stream"
+
+    if validators_match(request, etag, stat.st_mtime):
+        response = HttpResponseNotModified()
+        response["ETag"] = etag
+        patch_cache_control(response, **policy)
+        return response
+
+    mode = getattr(settings, "MEDIA_SENDFILE_MODE", "")
+    if mode in ("x-sendfile", "x-accel-redirect"):
+        # The proxy reads the file and handles Range itself.
+        response = HttpResponse(content_type=content_type)
+        if mode == "x-sendfile":
+            response["X-Sendfile"] = fullpath
+        else:
+            prefix = getattr(settings, "MEDIA_ACCEL_REDIRECT_PREFIX", "/protected-media/")
+            response["X-Accel-Redirect"] = prefix.rstrip("/") + "/" + path
+    else:
+        byte_range = None
+        if "HTTP_RANGE" in request.META and if_range_allows(request, etag, stat.st_mtime):
+            byte_range = parse_range(request.META["HTTP_RANGE"], stat.st_size)
+
+        if byte_range == "unsatisfiable":
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{stat.st_size}"
+            return response
+
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(iter_range(fullpath, start, length), status=206, content_type=content_type)
+            response["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+            response["Content-Length"] = str(length)
+        else:
+            # FileResponse hands the open file to the server's wsgi.file_wrapper,
+            # which uses sendfile(2) under gunicorn.
+            response = FileResponse(open(fullpath, "rb"), content_type=content_type)
+            response["Content-Length"] = str(stat.st_size)
+
+    if encoding:
+        response["Content-Encoding"] = encoding
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    patch_cache_control(response, **policy)
+    return response
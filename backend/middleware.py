@@ -0,0 +1,197 @@
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from store.metrics import registry, track_request
+
+from .compression import ENCODERS, acompress_stream, available_encodings, compress_stream, compressible, negotiate
+from .profiling import PROFILERS, is_staff, write_profile
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise that also runs natively under ASGI.
+
+    WhiteNoise's middleware is sync-only, and one sync-only middleware makes
+    Django run every request through a worker thread with the async views
+    called back onto the event loop. Static files are looked up in an
+    in-memory dict (outside autorefresh mode), so only actual file serving
+    needs a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class CompressionMiddleware:
+    """brotli or gzip for API responses of STORE_COMPRESSION_MIN_SIZE bytes or more.
+
+    The encoding is negotiated from Accept-Encoding among
+    STORE_COMPRESSION_ENCODINGS (brotli needs the optional `brotli`
+    package). Streaming responses are compressed chunk by chunk. Goes after
+    WhiteNoise, which serves static files precompressed.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.encodings = available_encodings()
+        if not getattr(settings, "STORE_COMPRESSION", True) or not self.encodings:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.min_size = getattr(settings, "STORE_COMPRESSION_MIN_SIZE", 1024)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        if not compressible(response) or (not response.streaming and len(response.content) < self.min_size):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = negotiate(request.META.get("HTTP_ACCEPT_ENCODING", ""), self.encodings)
+        if encoding is None:
+            return response
+
+        encoder = ENCODERS[encoding]()
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_stream(encoder, response.streaming_content)
+            else:
+                response.streaming_content = compress_stream(encoder, response.streaming_content)
+            response.headers.pop("Content-Length", None)
+        else:
+            compressed = encoder.compress(response.content) + encoder.finish()
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        # The bytes differ from the uncompressed representation, so a strong
+        # ETag would be wrong (same as Django's GZipMiddleware).
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+
+class InstrumentationMiddleware:
+    """Per-request SQL, serializer and total timings.
+
+    SQL comes from an execute wrapper on every database connection, the
+    serializer time from `store.metrics.measure()` blocks in the views. The
+    numbers are sent as a Server-Timing header (STORE_SERVER_TIMING) and
+    recorded per route for the /metrics endpoint. It should sit first in
+    MIDDLEWARE so the total covers the rest of the stack.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, "STORE_SERVER_TIMING", True)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with track_request() as timings:
+            response = self.get_response(request)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        with track_request() as timings:
+            response = await self.get_response(request)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        total = timings.elapsed()
+        match = request.resolver_match
+        route = match.route if match else "unmatched"
+        registry.record(route, request.method, response.status_code, timings, total)
+        if self.server_timing:
+            response.headers["Server-Timing"] = timings.server_timing(total)
+        return response
+
+
+class ProfilerMiddleware:
+    """Profile single requests on demand, into STORE_PROFILE_DIR.
+
+    A request is profiled when a staff user (admin session or JWT) sends the
+    STORE_PROFILE_HEADER header, whose value may pick the profiler
+    ("cprofile" or "sample"), or at random for a STORE_PROFILE_SAMPLE_RATE
+    fraction of requests. Without STORE_PROFILE_DIR the middleware removes
+    itself at startup. It must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.directory = getattr(settings, "STORE_PROFILE_DIR", "")
+        if not self.directory:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.header = getattr(settings, "STORE_PROFILE_HEADER", "X-Profile")
+        self.sample_rate = getattr(settings, "STORE_PROFILE_SAMPLE_RATE", 0.0)
+        self.default = getattr(settings, "STORE_PROFILE_MODE", "cprofile")
+        self.interval = getattr(settings, "STORE_PROFILE_INTERVAL", 0.005)
+
+    def __call__(self, request):
+        mode = self.requested_mode(request)
+        if mode is None:
+            return self.get_response(request)
+
+        profiler = PROFILERS[mode](self.interval)
+        start = time.perf_counter()
+        try:
+            profiler.start()
+        except ValueError:
+            # Python 3.12+ allows one cProfile at a time per process.
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+        path = write_profile(self.directory, profiler, request, response, time.perf_counter() - start)
+        if request.headers.get(self.header) is not None:
+            response.headers["X-Profile-File"] = path.name
+        return response
+
+    def requested_mode(self, request):
+        requested = request.headers.get(self.header)
+        if requested is not None and is_staff(request):
+            return requested if requested in PROFILERS else self.default
+        if self.sample_rate and random.random() < self.sample_rate:
+            return self.default
+        return None
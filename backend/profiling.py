@@ -0,0 +1,117 @@
+import cProfile
+import json
+import re
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+
+# Profilers for backend.middleware.ProfilerMiddleware.
+#
+# "cprofile" traces every call and writes a .pstats file (open it with
+# `python -m pstats`, snakeviz or `flameprof`). "sample" looks at the
+# request thread's stack every STORE_PROFILE_INTERVAL seconds from a
+# background thread and writes the stacks in the collapsed format that
+# flamegraph.pl and speedscope read; it barely slows the request down, at
+# the price of missing short calls. Each profile gets a .json file next to
+# it with the route, query string, status and timing of the request.
+
+
+class CProfiler:
+    suffix = ".pstats"
+
+    def __init__(self, interval=None):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def write(self, path):
+        self.profile.dump_stats(path)
+
+
+class StackSampler:
+    suffix = ".collapsed"
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def start(self):
+        self.thread_id = threading.get_ident()
+        self.thread = threading.Thread(target=self.run, name="profile-sampler", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as output:
+            for stack, count in self.stacks.most_common():
+                output.write(f"{stack} {count}\n")
+
+
+PROFILERS = {"cprofile": CProfiler, "sample": StackSampler}
+
+
+def is_staff(request):
+    """Staff by admin session or by a JWT access token."""
+    user = getattr(request, "user", None)
+    if user is not None and user.is_staff:
+        return True
+    try:
+        authenticated = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return authenticated is not None and authenticated[0].is_staff
+
+
+def profile_name(request):
+    match = request.resolver_match
+    route = match.route if match else request.path_info
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", route).strip("-") or "root"
+    return f"{timezone.now():%Y%m%dT%H%M%S.%f}-{request.method.lower()}-{slug[:80]}"
+
+
+def write_profile(directory, profiler, request, response, elapsed):
+    """Write the profile and its .json description; return the profile's path."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = profile_name(request)
+    path = directory / f"{name}{profiler.suffix}"
+    profiler.write(path)
+    match = request.resolver_match
+    meta = {
+        "method": request.method,
+        "path": request.path,
+        "route": match.route if match else None,
+        "view": match.view_name if match else None,
+        "query_string": request.META.get("QUERY_STRING", ""),
+        "status": response.status_code,
+        "duration_ms": round(elapsed * 1000, 3),
+        "profiler": profiler.suffix.lstrip("."),
+        "time": timezone.now().isoformat(),
+    }
+    (directory / f"{name}.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    return path
@@ -0,0 +1,98 @@
+"""Gunicorn settings for production: `gunicorn -c python:backend.server_config`.
+
+Worker and thread counts are derived from the CPUs this process may run on
+and the memory it may use (the cgroup limit inside a container, physical
+memory otherwise), so the same Procfile fits a 512 MB instance and a large
+VM. Every value can still be pinned through the environment:
+
+    GUNICORN_WORKER_CLASS  "gthread" (WSGI, default), "sync", or
+                           "uvicorn_worker.UvicornWorker" for the ASGI app
+                           with the async catalog views
+    WEB_CONCURRENCY        worker processes
+    GUNICORN_THREADS       threads per gthread worker
+    GUNICORN_WORKER_MEMORY_MB  memory budget per worker (default 160)
+    GUNICORN_TIMEOUT / GUNICORN_KEEPALIVE / GUNICORN_MAX_REQUESTS
+"""
+import os
+
+ASGI_WORKER = "uvicorn_worker.UvicornWorker"
+
+
+def cpu_count():
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    # cgroup v2 CPU quota ("max 100000" when unlimited).
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as fh:
+            quota, period = fh.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+def memory_bytes():
+    """Memory available to this process, or None if it can't be determined."""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as fh:
+                raw = fh.read().strip()
+        except OSError:
+            continue
+        # cgroup v1 reports "no limit" as a huge number.
+        if raw.isdigit() and int(raw) < 1 << 60:
+            return int(raw)
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def worker_count(cpus, memory, worker_memory_mb, worker_class):
+    # Async workers multiplex connections on an event loop, so one per CPU
+    # is enough; sync workers block on I/O and get the usual 2 * CPUs + 1.
+    wanted = cpus if worker_class == ASGI_WORKER else 2 * cpus + 1
+    if memory:
+        wanted = min(wanted, memory // (worker_memory_mb * 1024 * 1024))
+    return max(1, wanted)
+
+
+def thread_count(cpus, worker_class):
+    # Only gthread workers use threads; they cover I/O waits inside a worker.
+    return min(8, 2 * cpus) if worker_class == "gthread" else 1
+
+
+def env_int(name, default):
+    value = os.environ.get(name, "")
+    return int(value) if value.strip() else default
+
+
+# gthread by default: scripts/bench_async.py shows the ASGI stack well behind
+# on this app, since the catalog is mostly served from cache and under ASGI
+# Django runs each sync middleware hook on a thread anyway.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+workers = env_int(
+    "WEB_CONCURRENCY",
+    worker_count(cpu_count(), memory_bytes(), env_int("GUNICORN_WORKER_MEMORY_MB", 160), worker_class),
+)
+threads = env_int("GUNICORN_THREADS", thread_count(cpu_count(), worker_class))
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+timeout = env_int("GUNICORN_TIMEOUT", 30)
+graceful_timeout = 30
+keepalive = env_int("GUNICORN_KEEPALIVE", 5)
+# Recycle workers now and then so slow leaks can't grow without bound.
+max_requests = env_int("GUNICORN_MAX_REQUESTS", 2000)
+max_requests_jitter = max_requests // 10
+accesslog = "-"
+errorlog = "-"
+
+if worker_class == ASGI_WORKER:
+    # The ASGI app serves the catalog through the async views.
+    raw_env = ["STORE_ASYNC_CATALOG=1"]
+    wsgi_app = "backend.asgi:application"
+else:
+    wsgi_app = "backend.wsgi:application"
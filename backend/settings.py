@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from datetime import timedelta
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
 
 if os.getenv("DYNO") is None:
@@ -76,13 +77,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "backend.middleware.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "backend.middleware.AsyncWhiteNoiseMiddleware",
+    "backend.middleware.CompressionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "backend.middleware.ProfilerMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -110,17 +114,123 @@ WSGI_APPLICATION = "backend.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+_database_url = os.environ.get("DATABASE_URL") or os.environ.get(
+    "DJANGO_DATABASE_URL",
+    f"sqlite:///{(BASE_DIR / 'db.sqlite3').as_posix()}",
+)
+
 DATABASES = {
     "default": dj_database_url.config(
-        default=os.environ.get("DATABASE_URL") or os.environ.get(
-            "DJANGO_DATABASE_URL",
-            f"sqlite:///{(BASE_DIR / 'db.sqlite3').as_posix()}",
-        ),
+        default=_database_url,
         conn_max_age=int(os.environ.get("DJANGO_DB_CONN_MAX_AGE", 600)),
-        ssl_require=not DEBUG,
+        # SQLite has no notion of SSL; only require it for network databases.
+        ssl_require=not DEBUG and not _database_url.startswith("sqlite"),
     )
 }
 
+if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    # Tests get a file-backed database: the default shared in-memory one
+    # fails concurrent writers (ConcurrentCheckoutTests) with "table is
+    # locked" instead of waiting. One file per test process, so parallel
+    # runs on one machine don't share it.
+    DATABASES["default"]["TEST"] = {
+        "NAME": os.path.join(tempfile.gettempdir(), f"gear_store_test_{os.getpid()}.sqlite3"),
+    }
+
+
+# Cache
+# Local memory by default; point DJANGO_CACHE_BACKEND/DJANGO_CACHE_LOCATION at a
+# shared cache (Redis, Memcached) when running more than one process so that
+# catalog invalidations are seen by every worker.
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "DJANGO_CACHE_BACKEND",
+            "django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": os.environ.get("DJANGO_CACHE_LOCATION", "gear-store"),
+    }
+}
+
+# Seconds a cached catalog response (product/brand/category lists) is kept.
+STORE_CATALOG_CACHE_TIMEOUT = int(os.environ.get("STORE_CATALOG_CACHE_TIMEOUT", 300))
+
+# Cache-Control policies per catalog endpoint (keyword arguments for
+# django.utils.cache.patch_cache_control). Responses also carry ETag and
+# Last-Modified, so clients and CDNs revalidate with a cheap 304 once stale.
+STORE_CACHE_CONTROL = {
+    "product_list": {"public": True, "max_age": 60, "stale_while_revalidate": 300},
+    "product_detail": {"public": True, "max_age": 30, "stale_while_revalidate": 300},
+    "product_facets": {"public": True, "max_age": 60, "stale_while_revalidate": 300},
+    "product_batch": {"public": True, "max_age": 30, "stale_while_revalidate": 300},
+    "category_list": {"public": True, "max_age": 300, "stale_while_revalidate": 3600},
+    "brand_list": {"public": True, "max_age": 300, "stale_while_revalidate": 3600},
+}
+
+# Most ids plus slugs one /api/products/batch/ request may ask for.
+STORE_PRODUCT_BATCH_MAX = int(os.environ.get("STORE_PRODUCT_BATCH_MAX", 50))
+
+# Serve product detail and list reads from the pre-rendered ProductDocument
+# table (see store/documents.py). Run `manage.py rebuild_product_documents`
+# after turning it on; while off, documents aren't maintained either.
+STORE_PRODUCT_DOCUMENTS = env_bool("STORE_PRODUCT_DOCUMENTS", False)
+
+# Serve the catalog endpoints with the async views in store/async_views.py.
+# Only worth it under an ASGI server; backend/server_config.py turns it on
+# for the uvicorn worker.
+STORE_ASYNC_CATALOG = env_bool("STORE_ASYNC_CATALOG", False)
+
+# Live stock/price/is_active updates at /api/products/events/ (store/events.py,
+# store/streams.py). Under ASGI streams stay open for up to
+# STORE_EVENT_STREAM_MAX_AGE seconds and get the changes this process
+# publishes through STORE_EVENTS_BACKEND; the default in-process backend only
+# sees writes made by the same worker. Under WSGI the endpoint sends the
+# current values and EventSource polls every STORE_EVENT_STREAM_RETRY seconds.
+STORE_EVENTS_BACKEND = os.environ.get("STORE_EVENTS_BACKEND", "store.events.LocalEventBackend")
+STORE_EVENT_STREAM_MAX_IDS = 100
+STORE_EVENT_STREAM_HEARTBEAT = 15
+STORE_EVENT_STREAM_MAX_AGE = int(os.environ.get("STORE_EVENT_STREAM_MAX_AGE", 600))
+STORE_EVENT_STREAM_RETRY = float(os.environ.get("STORE_EVENT_STREAM_RETRY", 5))
+
+# Upper bounds of the price buckets /api/products/facets/ counts (the last
+# bucket is open-ended).
+STORE_PRICE_BUCKETS = (25, 50, 100, 250, 500)
+
+# Request instrumentation (backend.middleware.InstrumentationMiddleware):
+# SQL, serializer and total times go out as a Server-Timing header and into
+# per-route histograms at /metrics. Scrapes must send
+# "Authorization: Bearer <STORE_METRICS_TOKEN>"; without a token /metrics is
+# only served with DEBUG on.
+STORE_SERVER_TIMING = env_bool("STORE_SERVER_TIMING", True)
+STORE_METRICS_TOKEN = os.environ.get("STORE_METRICS_TOKEN", "")
+
+# On-demand profiling (backend.middleware.ProfilerMiddleware, off unless
+# STORE_PROFILE_DIR is set): staff requests with the X-Profile header, or a
+# random STORE_PROFILE_SAMPLE_RATE fraction of all requests, are profiled
+# with cProfile ("cprofile", .pstats files) or a stack sampler ("sample",
+# collapsed stacks for flame graphs).
+STORE_PROFILE_DIR = os.environ.get("STORE_PROFILE_DIR", "")
+STORE_PROFILE_HEADER = "X-Profile"
+STORE_PROFILE_SAMPLE_RATE = float(os.environ.get("STORE_PROFILE_SAMPLE_RATE", 0))
+STORE_PROFILE_MODE = os.environ.get("STORE_PROFILE_MODE", "cprofile")
+STORE_PROFILE_INTERVAL = 0.005
+
+# Checkout stock reservations (see store/inventory.py). Empty: lock and
+# decrement the Product rows in the checkout transaction. The local backend
+# keeps counters in process memory and is only safe with a single process
+# taking checkouts; the reconciler thread writes sales back every
+# STORE_INVENTORY_RECONCILE_INTERVAL seconds.
+STORE_INVENTORY_BACKEND = os.environ.get("STORE_INVENTORY_BACKEND", "")
+STORE_INVENTORY_HOLD_TTL = 60
+STORE_INVENTORY_RECONCILE_INTERVAL = float(os.environ.get("STORE_INVENTORY_RECONCILE_INTERVAL", 5))
+
+# Product search backend: "auto" uses Postgres full-text search or SQLite FTS5
+# depending on the database, or give a dotted path to a store.search backend.
+STORE_SEARCH_BACKEND = os.environ.get("STORE_SEARCH_BACKEND", "auto")
+
+# Admin changelists on Postgres show the planner's row estimate instead of an
+# exact COUNT(*) once it exceeds this (see store/admin.py).
+STORE_ADMIN_EXACT_COUNT_LIMIT = int(os.environ.get("STORE_ADMIN_EXACT_COUNT_LIMIT", 10000))
 
 
 # Password validation
@@ -179,10 +289,35 @@ WHITENOISE_MAX_AGE = 60 * 60 * 24 * 30  # 30 days
 # Media files (uploads). Override via env when pointing at external storage.
 MEDIA_URL = os.environ.get("DJANGO_MEDIA_URL", "/media/")
 MEDIA_ROOT = Path(os.environ.get("DJANGO_MEDIA_ROOT", str(BASE_DIR / "media")))
-DEFAULT_FILE_STORAGE = os.environ.get(
-    "DJANGO_FILE_STORAGE",
-    "django.core.files.storage.FileSystemStorage",
-)
+
+# Uploads are saved under content-hashed names (products/x.<hash>.jpg), which
+# lets backend.media serve them as immutable. Django 5.1+ only reads STORAGES;
+# "staticfiles" stays on Django's default, which is what STATICFILES_STORAGE
+# above has effectively meant since that setting was removed.
+STORAGES = {
+    "default": {
+        "BACKEND": os.environ.get("DJANGO_FILE_STORAGE", "store.storage.HashedFileSystemStorage"),
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+
+# Media serving (backend/media.py). Content-hashed names get an immutable
+# year-long Cache-Control, anything else MEDIA_MAX_AGE. Set
+# DJANGO_MEDIA_SENDFILE to "x-accel-redirect" (nginx) or "x-sendfile"
+# (Apache) to let the front proxy send the file bytes.
+MEDIA_MAX_AGE = int(os.environ.get("DJANGO_MEDIA_MAX_AGE", 60 * 60))
+MEDIA_IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+MEDIA_SENDFILE_MODE = os.environ.get("DJANGO_MEDIA_SENDFILE", "")
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get("DJANGO_MEDIA_ACCEL_PREFIX", "/protected-media/")
+
+# Product image derivatives (see store/images.py). STORE_IMAGE_PIPELINE is
+# "process" (build in a process pool after upload), "sync" or "off".
+STORE_IMAGE_PIPELINE = os.environ.get("STORE_IMAGE_PIPELINE", "process")
+STORE_IMAGE_WIDTHS = (320, 640, 1024)
+STORE_IMAGE_FORMATS = ("avif", "webp", "jpeg")
+STORE_IMAGE_WORKERS = int(os.environ.get("STORE_IMAGE_WORKERS", 0)) or None
 
 # Upload limits
 # Max upload size in bytes (default 2MB). Override with DJANGO_MAX_UPLOAD_SIZE.
@@ -221,9 +356,53 @@ SECURE_REFERRER_POLICY = "no-referrer-when-downgrade"
 SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 
 
+# Authenticate JWTs from their claims instead of loading the user row on
+# every request (see store/authentication.py). A deactivated user keeps
+# access until the token expires.
+STORE_STATELESS_JWT = env_bool("STORE_STATELESS_JWT", False)
+# Seconds and entries of the per-process cache of user rows behind
+# stateless tokens, for views that need the model instance.
+STORE_JWT_USER_CACHE_TTL = 30
+STORE_JWT_USER_CACHE_SIZE = 1024
+
+# Password hashing for register and login (see store/hashing.py): a
+# "thread" or "process" pool per worker process, or "inline". Requests that
+# find STORE_HASHING_MAX_PENDING hashes running or queued get a 429; keep it
+# below GUNICORN_THREADS. The auth endpoints are also limited per client IP.
+STORE_HASHING_POOL = os.environ.get("STORE_HASHING_POOL", "thread")
+STORE_HASHING_WORKERS = int(os.environ.get("STORE_HASHING_WORKERS", 1))
+STORE_HASHING_MAX_PENDING = int(os.environ.get("STORE_HASHING_MAX_PENDING", 2))
+STORE_AUTH_THROTTLE_RATE = os.environ.get("STORE_AUTH_THROTTLE_RATE", "20/min")
+
+AUTHENTICATION_BACKENDS = ["store.hashing.PooledModelBackend"]
+
+# API JSON is rendered and parsed with orjson when it is installed (see
+# store/renderers.py); STORE_FAST_JSON=0 goes back to the stdlib encoder.
+STORE_FAST_JSON = env_bool("STORE_FAST_JSON", True)
+
+# Response compression (backend/compression.py): JSON, NDJSON, CSV and plain
+# text responses of at least STORE_COMPRESSION_MIN_SIZE bytes, brotli (with
+# the optional `brotli` package) or gzip as the client prefers.
+STORE_COMPRESSION = env_bool("STORE_COMPRESSION", True)
+STORE_COMPRESSION_MIN_SIZE = int(os.environ.get("STORE_COMPRESSION_MIN_SIZE", 1024))
+STORE_COMPRESSION_ENCODINGS = ("br", "gzip")
+STORE_BROTLI_QUALITY = 4
+STORE_GZIP_LEVEL = 6
+
 REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": (
+        "store.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "store.renderers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "store.authentication.StatelessJWTAuthentication"
+        if STORE_STATELESS_JWT
+        else "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
     "DEFAULT_PAGINATION_CLASS": (
         "rest_framework.pagination.PageNumberPagination"
@@ -234,4 +413,6 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
+    # Adds username and email claims to the tokens.
+    "TOKEN_OBTAIN_SERIALIZER": "store.authentication.ClaimsTokenObtainPairSerializer",
 }
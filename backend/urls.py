@@ -5,9 +5,11 @@ from django.http import JsonResponse
 from django.views.generic import RedirectView  
 import os
 from pathlib import Path
-from django.views.static import serve
 from django.shortcuts import redirect
 
+from .media import serve_media
+from store.metrics import metrics_view
+
 
 
 def health(request):
@@ -42,10 +44,11 @@ def media_debug(request):
 urlpatterns = [
     path("", lambda request: redirect("/health/")),
     path("health/", health),
+    path("metrics", metrics_view),
     path("admin/", admin.site.urls),
     path("api/", include("store.urls")),
 ]
 
 urlpatterns += [
-    path("media/<path:path>", serve, {"document_root": settings.MEDIA_ROOT}),
+    path("media/<path:path>", serve_media),
 ]
\ No newline at end of file
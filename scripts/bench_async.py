@@ -0,0 +1,119 @@
+"""Sync (WSGI) vs async (ASGI) catalog throughput with slow clients.
+
+    python scripts/bench_async.py --size 2000 --clients 64 --client-delay 0.05
+
+Seeds a throwaway SQLite database, then starts gunicorn twice with
+backend.server_config and the same number of workers: once with sync WSGI
+workers and the DRF views, once with the uvicorn worker and the async views.
+Each client sends its request in two parts `--client-delay` seconds apart
+(a slow mobile connection), reads the response and repeats. A sync worker is
+tied up for that whole time; an async worker keeps serving other clients.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from benchutils import BASE_DIR, print_table, setup_django, summarize, test_database, wait_for_port
+
+setup_django()
+
+from store.cache import bump_catalog_version  # noqa: E402
+from store.seeding import seed_catalog  # noqa: E402
+
+SERVERS = [
+    ("sync wsgi", "sync"),
+    ("gthread wsgi", "gthread"),
+    ("async asgi", "uvicorn_worker.UvicornWorker"),
+]
+PATHS = ["/api/products/", "/api/products/?ordering=-price&page=2", "/api/categories/", "/api/products/product-7/"]
+
+
+async def client(port, delay, deadline, timings, errors):
+    index = 0
+    while time.perf_counter() < deadline:
+        path = PATHS[index % len(PATHS)]
+        index += 1
+        start = time.perf_counter()
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n".encode())
+            await writer.drain()
+            await asyncio.sleep(delay)
+            writer.write(b"X-Forwarded-Proto: https\r\nConnection: close\r\n\r\n")
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+        except OSError:
+            errors.append(path)
+            continue
+        if not response.startswith(b"HTTP/1.1 200"):
+            errors.append(path)
+            continue
+        timings.append((time.perf_counter() - start) * 1000)
+
+
+async def load(port, clients, delay, duration):
+    timings, errors = [], []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(client(port, delay, deadline, timings, errors) for _ in range(clients)))
+    return timings, errors
+
+
+def run(size, clients, delay, duration, workers):
+    rows = []
+    with test_database() as connection:
+        seed_catalog(size)
+        bump_catalog_version()
+        database_url = f"sqlite:///{connection.settings_dict['NAME']}"
+        for label, worker_class in SERVERS:
+            port = 8700 + len(rows)
+            env = {
+                **os.environ,
+                "DATABASE_URL": database_url,
+                "PORT": str(port),
+                "WEB_CONCURRENCY": str(workers),
+                "GUNICORN_WORKER_CLASS": worker_class,
+                "GUNICORN_MAX_REQUESTS": "0",
+            }
+            server = subprocess.Popen(
+                [sys.executable, "-m", "gunicorn", "-c", "python:backend.server_config"],
+                cwd=BASE_DIR,
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                wait_for_port(port)
+                # Let every worker finish booting and fill its caches first.
+                asyncio.run(load(port, clients, 0, 2.0))
+                timings, errors = asyncio.run(load(port, clients, delay, duration))
+            finally:
+                server.send_signal(signal.SIGTERM)
+                server.wait()
+            rows.append(
+                {
+                    "server": label,
+                    "workers": workers,
+                    "clients": clients,
+                    "req_per_s": round(len(timings) / duration, 1),
+                    "errors": len(errors),
+                    **summarize(timings or [0]),
+                }
+            )
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=2000, help="products to seed")
+    parser.add_argument("--clients", type=int, default=64, help="concurrent slow clients")
+    parser.add_argument("--client-delay", type=float, default=0.05, help="seconds each client stalls mid-request")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load per server")
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+    results = run(args.size, args.clients, args.client_delay, args.duration, args.workers)
+    print_table(results, ["server", "workers", "clients", "req_per_s", "errors", "p50_ms", "p95_ms"])
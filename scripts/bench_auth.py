@@ -0,0 +1,82 @@
+"""Authentication overhead of `me` and `my_orders`, per JWT authentication class.
+
+    python scripts/bench_auth.py --orders 10,100 --repeat 200
+
+"db" is simplejwt's JWTAuthentication, which loads the user row on every
+request; "stateless" is store.authentication.StatelessJWTAuthentication,
+which reads the user from the token's claims. "auth only" times just the
+authentication step.
+"""
+import argparse
+import json
+
+from benchutils import parse_sizes, print_table, setup_django, summarize, test_database, time_calls
+
+setup_django()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+from rest_framework_simplejwt.authentication import JWTAuthentication  # noqa: E402
+
+from store import views  # noqa: E402
+from store.authentication import ClaimsTokenObtainPairSerializer, StatelessJWTAuthentication  # noqa: E402
+from store.models import Order  # noqa: E402
+from store.seeding import seed_catalog  # noqa: E402
+
+AUTHENTICATORS = {"db": JWTAuthentication, "stateless": StatelessJWTAuthentication}
+
+
+def run(sizes, repeat):
+    factory = APIRequestFactory()
+    rows = []
+
+    with test_database(), override_settings(SECURE_SSL_REDIRECT=False):
+        seed_catalog(100)
+        user = get_user_model().objects.create_user("bench", email="bench@example.com", password="bench-pass")
+        token = str(ClaimsTokenObtainPairSerializer.get_token(user).access_token)
+        headers = {"Authorization": f"Bearer {token}"}
+
+        for size in sizes:
+            Order.objects.filter(user=user).delete()
+            Order.objects.bulk_create(
+                Order(user=user, customer_name="Bench", customer_email="bench@example.com", total_price=1)
+                for _ in range(size)
+            )
+            for label, authentication in AUTHENTICATORS.items():
+                targets = [
+                    ("auth only", lambda: authentication().authenticate(factory.get("/api/auth/me/", headers=headers))),
+                ]
+                for name, path, view in [("me", "/api/auth/me/", views.me), ("my_orders", "/api/orders/my/", views.my_orders)]:
+                    view = view.cls.as_view(authentication_classes=[authentication])
+                    targets.append((name, lambda view=view, path=path: view(factory.get(path, headers=headers))))
+
+                for name, call in targets:
+                    with CaptureQueriesContext(connection) as queries:
+                        call()
+                    rows.append(
+                        {
+                            "orders": size,
+                            "endpoint": name,
+                            "auth": label,
+                            "queries": len(queries),
+                            **summarize(time_calls(call, repeat)),
+                        }
+                    )
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", default="10,100")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = run(parse_sizes(args.orders), args.repeat)
+    print_table(results, ["orders", "endpoint", "auth", "queries", "p50_ms", "p95_ms"])
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
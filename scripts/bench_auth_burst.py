@@ -0,0 +1,153 @@
+"""Catalog latency during a burst of logins, with and without the hashing pool.
+
+    python scripts/bench_auth_burst.py --catalog-clients 8 --login-clients 16 --duration 10
+
+Seeds a throwaway SQLite database and starts one gthread gunicorn worker per
+scenario (`--threads` threads). Catalog clients request product pages in a
+loop the whole time; in the burst scenarios login clients post to
+/api/auth/token/ as fast as they can. With inline hashing every thread ends
+up computing PBKDF2 and catalog requests wait; with the pool
+(STORE_HASHING_POOL=thread) the excess logins get a quick 429 and the
+catalog keeps its latency. Per-IP throttling is lifted so it doesn't hide
+the effect.
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from benchutils import BASE_DIR, print_table, setup_django, summarize, test_database, wait_for_port
+
+setup_django()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+
+from store.cache import bump_catalog_version  # noqa: E402
+from store.seeding import seed_catalog  # noqa: E402
+
+CATALOG_PATHS = ["/api/products/", "/api/products/?ordering=-price&page=2", "/api/categories/"]
+LOGIN = json.dumps({"username": "bench", "password": "bench-pass"}).encode()
+
+SCENARIOS = [
+    ("no burst", "inline", False),
+    ("burst, inline hashing", "inline", True),
+    ("burst, hashing pool", "thread", True),
+]
+
+
+async def request(port, raw):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(raw)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b" ", 2)[1])
+
+
+async def catalog_client(port, deadline, timings, statuses):
+    index = 0
+    while time.perf_counter() < deadline:
+        path = CATALOG_PATHS[index % len(CATALOG_PATHS)]
+        index += 1
+        raw = f"GET {path} HTTP/1.1\r\nHost: localhost\r\nX-Forwarded-Proto: https\r\nConnection: close\r\n\r\n"
+        start = time.perf_counter()
+        status = await request(port, raw.encode())
+        statuses[f"catalog {status}"] += 1
+        if status == 200:
+            timings.append((time.perf_counter() - start) * 1000)
+
+
+async def login_client(port, deadline, statuses):
+    raw = (
+        b"POST /api/auth/token/ HTTP/1.1\r\nHost: localhost\r\nX-Forwarded-Proto: https\r\n"
+        b"Content-Type: application/json\r\nConnection: close\r\n"
+        + f"Content-Length: {len(LOGIN)}\r\n\r\n".encode()
+        + LOGIN
+    )
+    while time.perf_counter() < deadline:
+        status = await request(port, raw)
+        statuses[f"login {status}"] += 1
+        if status == 429:
+            # Honour Retry-After loosely, as a real client would back off.
+            await asyncio.sleep(0.2)
+
+
+async def load(port, catalog_clients, login_clients, duration):
+    timings, statuses = [], Counter()
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(
+        *(catalog_client(port, deadline, timings, statuses) for _ in range(catalog_clients)),
+        *(login_client(port, deadline, statuses) for _ in range(login_clients)),
+    )
+    return timings, statuses
+
+
+def run(size, catalog_clients, login_clients, duration, threads, max_pending):
+    rows = []
+    with test_database() as connection:
+        seed_catalog(size)
+        bump_catalog_version()
+        get_user_model().objects.create_user("bench", password="bench-pass")
+        database_url = f"sqlite:///{connection.settings_dict['NAME']}"
+        for label, pool, burst in SCENARIOS:
+            port = 8750 + len(rows)
+            env = {
+                **os.environ,
+                "DATABASE_URL": database_url,
+                "PORT": str(port),
+                "WEB_CONCURRENCY": "1",
+                "GUNICORN_THREADS": str(threads),
+                "GUNICORN_WORKER_CLASS": "gthread",
+                "GUNICORN_MAX_REQUESTS": "0",
+                "STORE_HASHING_POOL": pool,
+                "STORE_HASHING_MAX_PENDING": str(max_pending),
+                "STORE_AUTH_THROTTLE_RATE": "100000/s",
+            }
+            server = subprocess.Popen(
+                [sys.executable, "-m", "gunicorn", "-c", "python:backend.server_config"],
+                cwd=BASE_DIR,
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                wait_for_port(port)
+                asyncio.run(load(port, catalog_clients, 0, 1.0))
+                timings, statuses = asyncio.run(
+                    load(port, catalog_clients, login_clients if burst else 0, duration)
+                )
+            finally:
+                server.send_signal(signal.SIGTERM)
+                server.wait()
+            rows.append(
+                {
+                    "scenario": label,
+                    "catalog_req_per_s": round(len(timings) / duration, 1),
+                    **summarize(timings or [0]),
+                    "logins_ok": statuses["login 200"],
+                    "logins_429": statuses["login 429"],
+                }
+            )
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=1000, help="products to seed")
+    parser.add_argument("--catalog-clients", type=int, default=8)
+    parser.add_argument("--login-clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load per scenario")
+    parser.add_argument("--threads", type=int, default=4, help="gthread threads in the worker")
+    parser.add_argument("--max-pending", type=int, default=2, help="STORE_HASHING_MAX_PENDING")
+    args = parser.parse_args()
+    results = run(
+        args.size, args.catalog_clients, args.login_clients, args.duration, args.threads, args.max_pending
+    )
+    print_table(
+        results, ["scenario", "catalog_req_per_s", "p50_ms", "p95_ms", "logins_ok", "logins_429"]
+    )
@@ -0,0 +1,85 @@
+"""Requests/sec of product detail and list, with and without ProductDocument.
+
+    python scripts/bench_documents.py --size 2000 --repeat 200
+
+Drives the whole Django stack with the test client, once with
+STORE_PRODUCT_DOCUMENTS off (join + serializer) and once on (pre-rendered
+documents, see store/documents.py). The response cache is swapped for a
+dummy one so every list request is a miss; cache hits cost the same either
+way. Requests/sec are for one thread, from the median latency.
+"""
+import argparse
+import json
+
+from benchutils import print_table, setup_django, summarize, test_database, time_calls
+
+setup_django()
+
+from django.db import connection, transaction  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+
+from store.documents import rebuild_documents  # noqa: E402
+from store.models import Product  # noqa: E402
+from store.seeding import seed_catalog  # noqa: E402
+
+DUMMY_CACHE = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+
+def targets(slug):
+    return [
+        ("detail", f"/api/products/{slug}/", {}),
+        ("list", "/api/products/", {}),
+        ("list, by price", "/api/products/", {"ordering": "-price"}),
+        ("list, cursor", "/api/products/", {"pagination": "cursor", "ordering": "created_at"}),
+        ("list, sparse", "/api/products/", {"fields": "id,name,price"}),
+    ]
+
+
+def run(size, repeat):
+    results = []
+    client = Client()
+    with test_database(), override_settings(SECURE_SSL_REDIRECT=False, CACHES=DUMMY_CACHE):
+        seed_catalog(size)
+        with transaction.atomic():
+            rebuild_documents()
+        slug = Product.objects.filter(is_active=True).order_by("id").values_list("slug", flat=True)[size // 2]
+
+        for name, path, params in targets(slug):
+            for label, enabled in (("serializer", False), ("documents", True)):
+                with override_settings(STORE_PRODUCT_DOCUMENTS=enabled):
+
+                    def call():
+                        response = client.get(path, params)
+                        assert response.status_code == 200, response.status_code
+                        return response
+
+                    with CaptureQueriesContext(connection) as queries:
+                        call()
+                    # Read now: each request clears the connection's query log.
+                    query_count = len(queries)
+                    stats = summarize(time_calls(call, repeat))
+                    results.append(
+                        {
+                            "endpoint": name,
+                            "path": label,
+                            "queries": query_count,
+                            "req_per_s": round(1000 / stats["p50_ms"]),
+                            **stats,
+                        }
+                    )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = run(args.size, args.repeat)
+    print_table(results, ["endpoint", "path", "queries", "req_per_s", "p50_ms", "p95_ms"])
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
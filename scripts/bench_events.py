@@ -0,0 +1,164 @@
+"""Idle event streams per ASGI worker: memory, threads and fan-out latency.
+
+    python scripts/bench_events.py --streams 1000,5000
+
+Seeds a throwaway SQLite database and starts one uvicorn worker through
+backend.server_config. For each step it opens that many idle streams on
+/api/products/events/, all following the same product, and reads the
+worker's RSS and thread count from /proc. Then it checks out one unit of the
+product through the same worker and times how long each stream takes to
+receive the stock change. Linux only (reads /proc).
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import signal
+import subprocess
+import sys
+import time
+
+from benchutils import BASE_DIR, parse_sizes, print_table, setup_django, summarize, test_database, wait_for_port
+
+setup_django()
+
+from store.cache import bump_catalog_version  # noqa: E402
+from store.models import Product  # noqa: E402
+from store.seeding import seed_catalog  # noqa: E402
+
+PORT = 8790
+
+
+def worker_pid(master_pid):
+    with open(f"/proc/{master_pid}/task/{master_pid}/children") as fh:
+        return int(fh.read().split()[0])
+
+
+def process_stats(pid):
+    stats = {}
+    with open(f"/proc/{pid}/status") as fh:
+        for line in fh:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "Threads"):
+                stats[key] = int(value.split()[0])
+    return stats["VmRSS"] / 1024, stats["Threads"]
+
+
+async def open_stream(product_id):
+    reader, writer = await asyncio.open_connection("127.0.0.1", PORT)
+    writer.write(f"GET /api/products/events/?ids={product_id} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    received = b""
+    while b"event: product" not in received:
+        received += await reader.read(4096)
+    return reader, writer
+
+
+async def wait_for_event(reader, arrivals):
+    while b"event: product" not in await reader.read(4096):
+        pass
+    arrivals.append(time.perf_counter())
+
+
+async def checkout(product_id):
+    body = json.dumps({"items": [{"product_id": product_id, "quantity": 1}]})
+    reader, writer = await asyncio.open_connection("127.0.0.1", PORT)
+    writer.write(
+        (
+            "POST /api/orders/ HTTP/1.1\r\nHost: localhost\r\nX-Forwarded-Proto: https\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n{body}"
+        ).encode()
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    if not response.startswith(b"HTTP/1.1 201"):
+        raise RuntimeError(f"checkout failed: {response[:200]!r}")
+
+
+async def step(pid, product_id, count, streams):
+    while len(streams) < count:
+        batch = min(500, count - len(streams))
+        streams.extend(await asyncio.gather(*(open_stream(product_id) for _ in range(batch))))
+    await asyncio.sleep(1)
+    rss_mb, threads = process_stats(pid)
+
+    arrivals = []
+    waiters = [asyncio.ensure_future(wait_for_event(reader, arrivals)) for reader, _ in streams]
+    start = time.perf_counter()
+    await checkout(product_id)
+    await asyncio.wait_for(asyncio.gather(*waiters), 60)
+    latencies = [(arrival - start) * 1000 for arrival in arrivals]
+    return rss_mb, threads, latencies
+
+
+async def measure(pid, product_id, counts):
+    # Warm up: the first stream and checkout load most of Django's code.
+    warmup = []
+    await step(pid, product_id, 1, warmup)
+    warmup[0][1].close()
+    await asyncio.sleep(1)
+
+    rows, streams = [], []
+    base_rss, base_threads = process_stats(pid)
+    rows.append({"streams": 0, "rss_mb": round(base_rss, 1), "threads": base_threads})
+    for count in counts:
+        rss_mb, threads, latencies = await step(pid, product_id, count, streams)
+        stats = summarize(latencies)
+        rows.append(
+            {
+                "streams": count,
+                "rss_mb": round(rss_mb, 1),
+                "kb_per_stream": round((rss_mb - base_rss) * 1024 / count, 1),
+                "threads": threads,
+                "fanout_p50_ms": stats["p50_ms"],
+                "fanout_p95_ms": stats["p95_ms"],
+                "fanout_max_ms": round(max(latencies), 3),
+            }
+        )
+    for _, writer in streams:
+        writer.close()
+    return rows
+
+
+def run(counts):
+    # Every stream is a socket on both ends.
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    with test_database() as connection:
+        seed_catalog(100)
+        Product.objects.update(stock=1000)
+        bump_catalog_version()
+        product_id = Product.objects.filter(is_active=True).order_by("id").values_list("id", flat=True).first()
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{connection.settings_dict['NAME']}",
+            "PORT": str(PORT),
+            "WEB_CONCURRENCY": "1",
+            "GUNICORN_WORKER_CLASS": "uvicorn_worker.UvicornWorker",
+            "GUNICORN_MAX_REQUESTS": "0",
+        }
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "python:backend.server_config"],
+            cwd=BASE_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_for_port(PORT)
+            return asyncio.run(measure(worker_pid(server.pid), product_id, counts))
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--streams", default="1000,5000", help="open streams at each step (cumulative)")
+    args = parser.parse_args()
+    print_table(
+        run(sorted(parse_sizes(args.streams))),
+        ["streams", "rss_mb", "kb_per_stream", "threads", "fanout_p50_ms", "fanout_p95_ms", "fanout_max_ms"],
+    )
@@ -0,0 +1,92 @@
+"""Peak memory of the orders export, streamed vs. serialized in one go.
+
+    python scripts/bench_export.py --orders 1000,10000,50000
+
+"serializer" renders OrderSerializer(many=True) over every order, as
+`GET /api/orders/` without pagination used to; "ndjson" and "csv" drain
+the streaming export (store/exports.py) chunk by chunk, the way
+StreamingHttpResponse sends it. Peak memory is measured with tracemalloc,
+so it counts Python allocations only, not the database driver's buffers.
+The streaming rows should stay flat as the order count grows.
+"""
+import argparse
+import time
+import tracemalloc
+from itertools import islice
+
+from benchutils import parse_sizes, print_table, setup_django, test_database
+
+setup_django()
+
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from store.exports import export_orders  # noqa: E402
+from store.models import Order, OrderItem, Product  # noqa: E402
+from store.querysets import order_queryset  # noqa: E402
+from store.serializers import OrderSerializer  # noqa: E402
+from store.seeding import ITEMS_PER_ORDER, seed_catalog  # noqa: E402
+
+BATCH = 2000
+
+
+def top_up_orders(count):
+    """Add orders with ITEMS_PER_ORDER items each until there are `count`."""
+    products = list(Product.objects.values_list("id", "price")[:50])
+    missing = count - Order.objects.count()
+    while missing > 0:
+        orders = Order.objects.bulk_create(
+            Order(customer_name=f"Bench {n}", customer_email="bench@example.com", total_price=0)
+            for n in range(min(BATCH, missing))
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product_id=product_id, quantity=1, unit_price=price)
+            for index, order in enumerate(orders)
+            for product_id, price in islice(products[index % 40:], ITEMS_PER_ORDER)
+        )
+        missing -= len(orders)
+
+
+def serialized():
+    return len(JSONRenderer().render(OrderSerializer(order_queryset(), many=True).data))
+
+
+def streamed(fmt):
+    return lambda: sum(len(chunk.encode()) for chunk in export_orders(fmt))
+
+
+def measure(call):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = call()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, elapsed, peak
+
+
+def run(sizes):
+    rows = []
+    with test_database():
+        seed_catalog(100)
+        Order.objects.all().delete()
+        for size in sizes:
+            top_up_orders(size)
+            for label, call in [("serializer", serialized), ("ndjson", streamed("ndjson")), ("csv", streamed("csv"))]:
+                payload, elapsed, peak = measure(call)
+                rows.append(
+                    {
+                        "orders": size,
+                        "export": label,
+                        "payload_mb": round(payload / 2**20, 1),
+                        "peak_mb": round(peak / 2**20, 1),
+                        "seconds": round(elapsed, 2),
+                    }
+                )
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", default="1000,10000,50000")
+    args = parser.parse_args()
+    print_table(run(parse_sizes(args.orders)), ["orders", "export", "payload_mb", "peak_mb", "seconds"])
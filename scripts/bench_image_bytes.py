@@ -0,0 +1,64 @@
+"""Image bytes a client downloads for one product list page.
+
+    python scripts/bench_image_bytes.py --card-width 320 --page-size 10
+
+Builds variants for the sample images in media/products (in a temporary
+MEDIA_ROOT) and compares the bytes of one list page worth of originals with
+the variant a browser would pick from `image_srcset` for a card of the given
+CSS width, per format.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+
+from benchutils import BASE_DIR, print_table, setup_django
+
+setup_django()
+
+from django.core.files.storage import default_storage  # noqa: E402
+from django.test import override_settings  # noqa: E402
+
+from store.images import build_variants, variant_formats, variant_widths  # noqa: E402
+
+
+def pick(by_width, wanted):
+    """Smallest variant at least `wanted` px wide, else the widest one."""
+    widths = sorted(int(width) for width in by_width)
+    chosen = next((width for width in widths if width >= wanted), widths[-1])
+    return by_width[str(chosen)]
+
+
+def run(card_width, page_size):
+    source_dir = os.path.join(BASE_DIR, "media", "products")
+    media_root = tempfile.mkdtemp()
+    try:
+        shutil.copytree(source_dir, os.path.join(media_root, "products"))
+        with override_settings(MEDIA_ROOT=media_root):
+            names = sorted(f"products/{name}" for name in os.listdir(source_dir))
+            manifests = [build_variants(name, variant_widths(), variant_formats()) for name in names]
+            page = [manifests[i % len(manifests)] for i in range(page_size)]
+
+            rows = [{"served": "original", "bytes": sum(default_storage.size(m["source"]) for m in page)}]
+            for fmt in variant_formats():
+                rows.append(
+                    {
+                        "served": f"{fmt} @{card_width}w",
+                        "bytes": sum(default_storage.size(pick(m["formats"][fmt], card_width)) for m in page),
+                    }
+                )
+    finally:
+        shutil.rmtree(media_root, ignore_errors=True)
+
+    baseline = rows[0]["bytes"]
+    for row in rows:
+        row["vs_original"] = f"{row['bytes'] / baseline:.1%}"
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--card-width", type=int, default=320, help="rendered image width in px (x DPR)")
+    parser.add_argument("--page-size", type=int, default=10)
+    args = parser.parse_args()
+    print_table(run(args.card_width, args.page_size), ["served", "bytes", "vs_original"])
@@ -0,0 +1,82 @@
+"""JSON rendering time and bytes on the wire, per renderer and encoding.
+
+    python scripts/bench_json.py --size 2000 --repeat 50
+
+Renders product list and order responses with DRF's stdlib JSONRenderer
+("json") and store.renderers.FastJSONRenderer ("orjson"), then compresses
+the body the way backend.middleware.CompressionMiddleware would. Brotli
+columns are left empty unless the optional `brotli` package is installed.
+"""
+import argparse
+
+from benchutils import print_table, setup_django, summarize, test_database, time_calls
+
+setup_django()
+
+from django.test import override_settings  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from backend.compression import BrotliEncoder, GzipEncoder, brotli  # noqa: E402
+from store import views  # noqa: E402
+from store.querysets import order_queryset  # noqa: E402
+from store.renderers import FastJSONRenderer  # noqa: E402
+from store.serializers import OrderExpandedSerializer  # noqa: E402
+from store.seeding import seed_catalog  # noqa: E402
+
+RENDERERS = {"json": JSONRenderer, "orjson": FastJSONRenderer}
+
+
+def compressed_size(encoder_class, content, repeat):
+    def call():
+        encoder = encoder_class()
+        return encoder.compress(content) + encoder.finish()
+
+    size = len(call())
+    return size, summarize(time_calls(call, repeat))["p50_ms"]
+
+
+def payloads(factory):
+    def view_data(view, path, params=None):
+        return view(factory.get(path, params or {})).data
+
+    return [
+        ("product list page", lambda: view_data(views.product_list, "/api/products/")),
+        ("order page", lambda: view_data(views.order_list_create, "/api/orders/")),
+        ("order page, expanded", lambda: view_data(views.order_list_create, "/api/orders/", {"expand": "product"})),
+        ("500 orders, expanded", lambda: OrderExpandedSerializer(order_queryset(expand=True)[:500], many=True).data),
+    ]
+
+
+def run(size, repeat):
+    factory = APIRequestFactory()
+    rows = []
+    with test_database(), override_settings(SECURE_SSL_REDIRECT=False):
+        seed_catalog(size)
+        for label, build in payloads(factory):
+            data = build()
+            for name, renderer_class in RENDERERS.items():
+                renderer = renderer_class()
+                content = renderer.render(data)
+                row = {
+                    "response": label,
+                    "renderer": name,
+                    "render_ms": summarize(time_calls(lambda: renderer.render(data), repeat))["p50_ms"],
+                    "bytes": len(content),
+                }
+                row["gzip_bytes"], row["gzip_ms"] = compressed_size(GzipEncoder, content, repeat)
+                if brotli is not None:
+                    row["br_bytes"], row["br_ms"] = compressed_size(BrotliEncoder, content, repeat)
+                rows.append(row)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=2000, help="products to seed")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    print_table(
+        run(args.size, args.repeat),
+        ["response", "renderer", "render_ms", "bytes", "gzip_bytes", "gzip_ms", "br_bytes", "br_ms"],
+    )
@@ -0,0 +1,79 @@
+"""Media serving throughput: backend.media.serve_media vs django.views.static.serve.
+
+    python scripts/bench_media.py --repeat 500
+
+Serves the sample images in media/products (from a temporary MEDIA_ROOT)
+through both views with full, conditional (If-None-Match) and ranged
+requests, draining the response body the way a WSGI server would.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+
+from benchutils import BASE_DIR, print_table, setup_django, summarize, time_calls
+
+setup_django()
+
+from django.test import RequestFactory, override_settings  # noqa: E402
+from django.views.static import serve  # noqa: E402
+
+from backend.media import serve_media  # noqa: E402
+
+
+def drain(response):
+    if response.streaming:
+        body = b"".join(response.streaming_content)
+    else:
+        body = response.content
+    response.close()
+    return body
+
+
+def run(repeat):
+    source_dir = os.path.join(BASE_DIR, "media", "products")
+    media_root = tempfile.mkdtemp()
+    factory = RequestFactory()
+    views = {
+        "static.serve": lambda request, path: serve(request, path, document_root=media_root),
+        "serve_media": serve_media,
+    }
+    rows = []
+    try:
+        shutil.copytree(source_dir, os.path.join(media_root, "products"))
+        path = "products/" + sorted(os.listdir(source_dir))[0]
+        with override_settings(MEDIA_ROOT=media_root, MEDIA_SENDFILE_MODE=""):
+            for view_name, view in views.items():
+                etag = view(factory.get("/"), path).get("ETag")
+                cases = {
+                    "full": {},
+                    "if-none-match": {"HTTP_IF_NONE_MATCH": etag} if etag else None,
+                    "range 0-1023": {"HTTP_RANGE": "bytes=0-1023"},
+                }
+                for case, headers in cases.items():
+                    if headers is None:
+                        rows.append({"view": view_name, "request": case, "status": "n/a"})
+                        continue
+                    request = factory.get("/", **headers)
+                    status = view(request, path).status_code
+                    timings = time_calls(lambda: drain(view(request, path)), repeat)
+                    stats = summarize(timings)
+                    rows.append(
+                        {
+                            "view": view_name,
+                            "request": case,
+                            "status": status,
+                            "req_per_s": round(1000 * len(timings) / sum(timings)),
+                            **stats,
+                        }
+                    )
+    finally:
+        shutil.rmtree(media_root, ignore_errors=True)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+    print_table(run(args.repeat), ["view", "request", "status", "req_per_s", "p50_ms", "p95_ms"])
@@ -0,0 +1,79 @@
+"""Payload size and serialization time of order history responses.
+
+    python scripts/bench_order_payload.py --orders 200,2000,5000
+
+"before" is the old response: every order, each item with the full nested
+product. "after" is the default response today: one page of orders with
+compact items. "expanded page" is one page with `?expand=product`.
+"""
+import argparse
+import json
+
+from benchutils import parse_sizes, print_table, setup_django, summarize, test_database, time_calls
+
+setup_django()
+
+from django.test import override_settings  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from store.models import Order  # noqa: E402
+from store.querysets import order_queryset  # noqa: E402
+from store.serializers import OrderExpandedSerializer  # noqa: E402
+from store.seeding import seed_catalog  # noqa: E402
+from store.views import order_list_create  # noqa: E402
+
+
+def run(sizes, repeat):
+    factory = APIRequestFactory()
+    renderer = JSONRenderer()
+    rows = []
+
+    def before():
+        orders = order_queryset(expand=True)
+        return renderer.render(OrderExpandedSerializer(orders, many=True).data)
+
+    def view(params):
+        def call():
+            response = order_list_create(factory.get("/api/orders/", params))
+            response.accepted_renderer = renderer
+            response.accepted_media_type = "application/json"
+            response.renderer_context = {}
+            return response.render().content
+
+        return call
+
+    with test_database(), override_settings(SECURE_SSL_REDIRECT=False):
+        for size in sizes:
+            # seed_catalog seeds one order per 20 products.
+            seed_catalog(size * 20)
+            orders = Order.objects.count()
+            for label, call in [
+                ("before", before),
+                ("after", view({})),
+                ("expanded page", view({"expand": "product"})),
+            ]:
+                payload = call()
+                rows.append(
+                    {
+                        "orders": orders,
+                        "response": label,
+                        "bytes": len(payload),
+                        **summarize(time_calls(call, repeat)),
+                    }
+                )
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", default="200,2000,5000")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = run(parse_sizes(args.orders), args.repeat)
+    print_table(results, ["orders", "response", "bytes", "p50_ms", "p95_ms"])
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
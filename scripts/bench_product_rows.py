@@ -0,0 +1,61 @@
+"""Rows/sec of ProductListSerializer vs the .values() fast path (store.rows).
+
+    python scripts/bench_product_rows.py --rows 10,100,1000
+
+Serializes the same products both ways (query included), for the full row
+and for a sparse `?fields=id,name,slug,price,image` row.
+"""
+import argparse
+
+from benchutils import parse_sizes, print_table, setup_django, summarize, test_database, time_calls
+
+setup_django()
+
+from rest_framework.request import Request  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from store.querysets import product_queryset  # noqa: E402
+from store.rows import ProductRows  # noqa: E402
+from store.serializers import ProductListSerializer  # noqa: E402
+from store.seeding import seed_catalog  # noqa: E402
+
+SPARSE = ("id", "name", "slug", "price", "image")
+
+
+def run(sizes, repeat):
+    request = Request(APIRequestFactory().get("/api/products/"))
+    results = []
+    with test_database():
+        seed_catalog(max(sizes))
+        for size in sizes:
+            products = product_queryset().order_by("id")[:size]
+            for label, fields in (("full", None), ("sparse", SPARSE)):
+                context = {"request": request, "fields": fields}
+
+                def serializer():
+                    return ProductListSerializer(products, many=True, context=context).data
+
+                def fast():
+                    rows = ProductRows(request, fields)
+                    return rows.data(rows.values(products))
+
+                for path, call in (("serializer", serializer), ("values rows", fast)):
+                    stats = summarize(time_calls(call, repeat))
+                    results.append(
+                        {
+                            "rows": size,
+                            "fields": label,
+                            "path": path,
+                            "rows_per_s": round(size / (stats["p50_ms"] / 1000)),
+                            **stats,
+                        }
+                    )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", default="10,100,1000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    print_table(run(parse_sizes(args.rows), args.repeat), ["rows", "fields", "path", "rows_per_s", "p50_ms", "p95_ms"])
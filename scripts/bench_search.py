@@ -0,0 +1,54 @@
+"""Compare the configured search backend against the old icontains scan.
+
+    python scripts/bench_search.py --sizes 10000,100000,1000000
+
+Seeds a throwaway database at each size and times the same queries through
+both backends. Run it with DATABASE_URL pointing at Postgres to measure the
+tsvector/GIN backend; SQLite measures FTS5.
+"""
+import argparse
+import json
+
+from benchutils import parse_sizes, print_table, setup_django, summarize, test_database, time_calls
+
+setup_django()
+
+from store.models import Product  # noqa: E402
+from store.search import IcontainsSearchBackend, get_search_backend  # noqa: E402
+from store.seeding import seed_catalog  # noqa: E402
+
+QUERIES = ["product 42", "description", "nothing-matches-this"]
+
+
+def run(sizes, repeat):
+    rows = []
+    indexed = get_search_backend()
+    backends = [("icontains", IcontainsSearchBackend()), (type(indexed).__name__, indexed)]
+    with test_database():
+        for size in sizes:
+            seed_catalog(size)
+            base = Product.objects.filter(is_active=True)
+            for query in QUERIES:
+                for label, backend in backends:
+                    # Same work as one product_list page: the COUNT plus a page of rows.
+                    def page():
+                        qs = backend.search(base, query)
+                        qs.count()
+                        list(qs[:10])
+
+                    rows.append({"rows": size, "query": query, "backend": label, **summarize(time_calls(page, repeat))})
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = run(parse_sizes(args.sizes), args.repeat)
+    print_table(results, ["rows", "query", "backend", "p50_ms", "p95_ms"])
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
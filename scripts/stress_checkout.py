@@ -0,0 +1,143 @@
+"""Multi-threaded checkout stress test: overselling and orders/sec.
+
+    python scripts/stress_checkout.py --threads 16 --orders 50 --stock 300
+
+Runs the same burst of concurrent single-item checkouts against a few hot
+products through a copy of the previous per-item implementation, through the
+current `order_list_create` with row locks ("bulk"), and through it with the
+in-process reservation backend ("reserved", store/inventory.py, reconciled
+once after the burst). It then checks that stock + units sold still equals
+the starting stock. Point DATABASE_URL at Postgres for meaningful
+numbers; SQLite serializes writers and reports lock errors as failures.
+"""
+import argparse
+import random
+import threading
+import time
+from decimal import Decimal
+
+from benchutils import print_table, setup_django, test_database
+
+setup_django()
+
+from django.db import connections, transaction  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from rest_framework import status  # noqa: E402
+from rest_framework.decorators import api_view  # noqa: E402
+from rest_framework.response import Response  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from store.inventory import get_inventory_backend  # noqa: E402
+from store.models import Brand, Category, Order, OrderItem, Product  # noqa: E402
+from store.serializers import OrderSerializer  # noqa: E402
+from store.views import order_list_create  # noqa: E402
+
+
+@api_view(["POST"])
+def legacy_order_create(request):
+    """The checkout as it was: one get, one insert and one save per line."""
+    items_data = request.data.get("items", [])
+    with transaction.atomic():
+        order = Order.objects.create(status="pending", total_price=0)
+        total = Decimal("0.00")
+        for item in items_data:
+            try:
+                product = Product.objects.get(id=item["product_id"], is_active=True)
+            except Product.DoesNotExist:
+                transaction.set_rollback(True)
+                return Response({"detail": "not found"}, status=status.HTTP_400_BAD_REQUEST)
+            if product.stock < item["quantity"]:
+                transaction.set_rollback(True)
+                return Response({"detail": "Not enough stock"}, status=status.HTTP_400_BAD_REQUEST)
+            OrderItem.objects.create(order=order, product=product, quantity=item["quantity"], unit_price=product.price)
+            product.stock -= item["quantity"]
+            product.save()
+            total += product.price * item["quantity"]
+        order.total_price = total
+        order.save()
+    return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+
+
+def reset_catalog(products, stock):
+    OrderItem.objects.all().delete()
+    Order.objects.all().delete()
+    Product.objects.filter(id__in=[p.id for p in products]).update(stock=stock)
+
+
+def burst(view, products, threads, orders_per_thread, items_per_order):
+    factory = APIRequestFactory()
+    outcomes = {"created": 0, "rejected": 0, "errors": 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(seed):
+        rnd = random.Random(seed)
+        barrier.wait()
+        try:
+            for _ in range(orders_per_thread):
+                chosen = rnd.sample(products, items_per_order)
+                payload = {"items": [{"product_id": p.id, "quantity": 1} for p in chosen]}
+                request = factory.post("/api/orders/", payload, format="json")
+                try:
+                    code = view(request).status_code
+                    key = "created" if code == 201 else "rejected"
+                except Exception:
+                    key = "errors"
+                with lock:
+                    outcomes[key] += 1
+        finally:
+            connections.close_all()
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return outcomes, elapsed
+
+
+def run(args):
+    rows = []
+    with test_database():
+        category = Category.objects.create(name="Hot", slug="hot")
+        brand = Brand.objects.create(name="Drop")
+        products = [
+            Product.objects.create(name=f"Hot {i}", slug=f"hot-{i}", brand=brand, category=category, price="10.00")
+            for i in range(args.products)
+        ]
+        for label, view, backend in [
+            ("legacy", legacy_order_create, ""),
+            ("bulk", order_list_create, ""),
+            ("reserved", order_list_create, "store.inventory.LocalInventoryBackend"),
+        ]:
+            reset_catalog(products, args.stock)
+            with override_settings(STORE_INVENTORY_BACKEND=backend, STORE_INVENTORY_RECONCILE_INTERVAL=0):
+                outcomes, elapsed = burst(view, products, args.threads, args.orders, args.items)
+                inventory = get_inventory_backend()
+                if inventory is not None:
+                    inventory.reconcile()
+            remaining = sum(Product.objects.filter(id__in=[p.id for p in products]).values_list("stock", flat=True))
+            sold = sum(OrderItem.objects.values_list("quantity", flat=True))
+            rows.append(
+                {
+                    "path": label,
+                    **outcomes,
+                    "orders_per_sec": round(outcomes["created"] / elapsed, 1),
+                    "sold": sold,
+                    "oversold": args.stock * len(products) - remaining != sold or remaining < 0,
+                }
+            )
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--orders", type=int, default=25, help="orders per thread")
+    parser.add_argument("--products", type=int, default=5)
+    parser.add_argument("--items", type=int, default=2, help="line items per order")
+    parser.add_argument("--stock", type=int, default=100, help="starting stock per product")
+    args = parser.parse_args()
+    print_table(run(args), ["path", "created", "rejected", "errors", "orders_per_sec", "sold", "oversold"])
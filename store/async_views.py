@@ -0,0 +1,152 @@
+from functools import wraps
+
+from django.http import HttpResponse
+from django.views.decorators.http import require_safe
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+
+from .cache import cache_timeout, catalog_cache_key, get_cache, record
+from .conditional import cache_policy, conditional_catalog_list, conditional_product_detail, prefetch_product_stamp
+from .documents import document_data, document_detail_content, document_rows, filtered_documents, serves_documents
+from .metrics import measure
+from .models import ProductDocument
+from .pagination import AsyncPageNumberPagination
+from .querysets import brand_queryset, category_queryset, product_queryset
+from .renderers import FastJSONRenderer
+from .rows import ProductRows, sparse_context, sparse_fieldset
+from .serializers import BrandSerializer, CategorySerializer, ProductDetailSerializer
+from .views import filtered_products, product_paginator
+
+
+# Async versions of the read-only catalog endpoints, for ASGI deployments
+# (STORE_ASYNC_CATALOG, see store/urls.py and backend/server_config.py).
+#
+# They return the same JSON as the DRF views in store/views.py and share
+# their response cache, conditional GET handling and Cache-Control policy,
+# but query through the async ORM so a worker's event loop keeps serving
+# other requests while one waits on the database or a slow client. Only JSON
+# is rendered; the browsable API stays on the sync views.
+
+
+def json_response(data, status=200):
+    response = HttpResponse(FastJSONRenderer().render(data), status=status, content_type="application/json")
+    # Like DRF's Response, keep the payload around for the response cache.
+    response.data = data
+    return response
+
+
+def cached_catalog_json(name):
+    """Async counterpart of store.cache.cached_catalog_response (same keys)."""
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            cache = get_cache()
+            key = catalog_cache_key(name, request)
+            data = await cache.aget(key)
+            if data is not None:
+                record(name, "hits")
+                response = json_response(data)
+                response["X-Cache"] = "HIT"
+                return response
+
+            record(name, "misses")
+            response = await view(request, *args, **kwargs)
+            if response.status_code == 200:
+                await cache.aset(key, response.data, cache_timeout())
+            response["X-Cache"] = "MISS"
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def catalog_view(name):
+    """Decorator stack of the sync catalog list views, for async ones."""
+
+    def decorator(view):
+        return cache_policy(name)(conditional_catalog_list(name)(require_safe(cached_catalog_json(name)(view))))
+
+    return decorator
+
+
+@catalog_view("category_list")
+async def category_list(request):
+    categories = [category async for category in category_queryset()]
+    with measure("serialize"):
+        data = CategorySerializer(categories, many=True).data
+    return json_response(data)
+
+
+@catalog_view("brand_list")
+async def brand_list(request):
+    brands = [brand async for brand in brand_queryset()]
+    with measure("serialize"):
+        data = BrandSerializer(brands, many=True).data
+    return json_response(data)
+
+
+@catalog_view("product_list")
+async def product_list(request):
+    # DRF's Request wrapper for query_params, as the pagination classes expect.
+    request = Request(request)
+    documents = filtered_documents(request) if serves_documents(request) else None
+    if documents is not None:
+        return await document_list(request, documents)
+
+    rows = ProductRows(request, *sparse_fieldset(request))
+    paginator = product_paginator(request, AsyncPageNumberPagination)
+    products = rows.values(filtered_products(request), paginator)
+    try:
+        page = await paginator.apaginate_queryset(products, request)
+    except NotFound as exc:
+        return json_response({"detail": exc.detail}, status=exc.status_code)
+
+    if page is not None:
+        with measure("serialize"):
+            data = rows.data(page)
+        return json_response(paginator.get_paginated_response(data).data)
+
+    products = [product async for product in products]
+    with measure("serialize"):
+        data = rows.data(products)
+    return json_response(data)
+
+
+async def document_list(request, documents):
+    paginator = product_paginator(request, AsyncPageNumberPagination)
+    rows = document_rows(documents)
+    try:
+        page = await paginator.apaginate_queryset(rows, request)
+    except NotFound as exc:
+        return json_response({"detail": exc.detail}, status=exc.status_code)
+
+    if page is not None:
+        with measure("serialize"):
+            data = document_data(request, [row["body"] for row in page])
+        return json_response(paginator.get_paginated_response(data).data)
+
+    bodies = [row["body"] async for row in rows]
+    with measure("serialize"):
+        data = document_data(request, bodies)
+    return json_response(data)
+
+
+@cache_policy("product_detail")
+@require_safe
+@prefetch_product_stamp
+@conditional_product_detail
+async def product_detail(request, slug):
+    stamp = request._product_stamp
+    if stamp and serves_documents(request):
+        body = await ProductDocument.objects.filter(id=stamp[0]).values_list("body", flat=True).afirst()
+        if body:
+            return HttpResponse(document_detail_content(request, body), content_type="application/json")
+
+    product = await product_queryset().filter(slug=slug).afirst()
+    if product is None:
+        return json_response({"detail": "Not found."}, status=404)
+    with measure("serialize"):
+        data = ProductDetailSerializer(product, context=sparse_context(request)).data
+    return json_response(data)
@@ -0,0 +1,114 @@
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+
+# Stateless JWT authentication.
+#
+# simplejwt's JWTAuthentication loads the user row on every request. Tokens
+# from ClaimsTokenObtainPairSerializer carry the username and email, and the
+# is_staff/is_superuser flags IsAdminUser checks, so
+# StatelessJWTAuthentication (STORE_STATELESS_JWT) can build a ClaimsUser
+# from the token alone; `me` and `my_orders` then run without a user query.
+# Views that need the model instance (checkout attaches the order to it) get
+# it through `db_user()`, from a small per-process TTL cache.
+#
+# The price: a deactivated or deleted user, or a revoked staff flag, keeps
+# working until the access token expires (SIMPLE_JWT["ACCESS_TOKEN_LIFETIME"]).
+
+CLAIMS = ("username", "email", "is_staff", "is_superuser")
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        for claim in CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
+
+
+class UserCache:
+    """User rows by id for a few seconds, bounded, safe across threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(user_id)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        User = get_user_model()
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is None or not user.is_active:
+            raise AuthenticationFailed("User not found or inactive.", code="user_not_found")
+        with self.lock:
+            self.entries.pop(user_id, None)
+            while len(self.entries) >= getattr(settings, "STORE_JWT_USER_CACHE_SIZE", 1024):
+                # Dicts keep insertion order: drop the oldest entry.
+                del self.entries[next(iter(self.entries))]
+            self.entries[user_id] = (now + getattr(settings, "STORE_JWT_USER_CACHE_TTL", 30), user)
+        return user
+
+    def discard(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+user_cache = UserCache()
+
+
+class ClaimsUser(TokenUser):
+    """A user built from token claims; other attributes come from the user row."""
+
+    @cached_property
+    def id(self):
+        # simplejwt writes the id claim as a string.
+        return get_user_model()._meta.pk.to_python(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def pk(self):
+        return self.id
+
+    @cached_property
+    def email(self):
+        return self.token.get("email", "")
+
+    @property
+    def db_user(self):
+        return user_cache.get(self.id)
+
+    def __getattr__(self, name):
+        # Only reached for attributes TokenUser doesn't have (first_name, ...).
+        if name.startswith("_") or name == "token":
+            raise AttributeError(name)
+        return getattr(self.db_user, name)
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    def get_user(self, validated_token):
+        if not all(claim in validated_token for claim in CLAIMS):
+            # Issued before the claims were added: look the user up.
+            return JWTAuthentication.get_user(self, validated_token)
+        return ClaimsUser(validated_token)
+
+
+def db_user(user):
+    """The user model instance behind `request.user`."""
+    return user.db_user if isinstance(user, ClaimsUser) else user
@@ -0,0 +1,175 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from .querysets import PRODUCT_ORDERINGS
+
+
+# Versioned response cache for the catalog endpoints.
+#
+# Every cached payload is stored under a key that embeds the current catalog
+# version. Anything that changes what the catalog endpoints return (saving or
+# deleting a product/brand/category, checkout decrementing stock) bumps the
+# version, which orphans all previous entries at once; they simply age out of
+# the cache. No key scanning or explicit deletes are needed.
+#
+# Versions are kept per scope: "catalog" covers everything the catalog
+# endpoints return, "taxonomy" only brands and categories (which are nested
+# into every product). Each bump also records when it happened, for
+# Last-Modified headers.
+
+CATALOG = "catalog"
+TAXONOMY = "taxonomy"
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[getattr(settings, "STORE_CACHE_ALIAS", "default")]
+
+
+def cache_timeout():
+    return getattr(settings, "STORE_CATALOG_CACHE_TIMEOUT", 300)
+
+
+def _fresh_version():
+    # Seed from the clock so that a version key that was evicted never comes
+    # back with a number older entries are still stored under.
+    return int(time.time() * 1000)
+
+
+def version_key(scope):
+    return f"store:{scope}-version"
+
+
+def changed_at_key(scope):
+    return f"store:{scope}-changed-at"
+
+
+def catalog_version(scope=CATALOG):
+    cache = get_cache()
+    key = version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _fresh_version(), None)
+        version = cache.get(key) or _fresh_version()
+    return version
+
+
+def bump_catalog_version(scope=CATALOG):
+    cache = get_cache()
+    cache.set(changed_at_key(scope), time.time(), None)
+    try:
+        return cache.incr(version_key(scope))
+    except ValueError:
+        version = _fresh_version()
+        cache.set(version_key(scope), version, None)
+        return version
+
+
+def catalog_changed_at(scope=CATALOG):
+    """When the scope last changed; "now" if this cache never saw a change."""
+    cache = get_cache()
+    changed_at = cache.get(changed_at_key(scope))
+    if changed_at is None:
+        cache.add(changed_at_key(scope), time.time(), None)
+        changed_at = cache.get(changed_at_key(scope)) or time.time()
+    return datetime.fromtimestamp(changed_at, tz=timezone.utc)
+
+
+def normalize_query_params(query_params):
+    """Return a canonical, hashable form of the request's query string.
+
+    Blank values are dropped, keys and repeated values are sorted, unknown
+    `ordering` values are dropped (the view ignores them) and `page=1` is
+    treated the same as no page at all.
+    """
+    normalized = []
+    for key in sorted(query_params.keys()):
+        values = sorted(v for v in query_params.getlist(key) if v != "")
+        if key == "ordering":
+            values = [v for v in values if v in PRODUCT_ORDERINGS]
+        if key == "page" and values == ["1"]:
+            values = []
+        if values:
+            normalized.append((key, tuple(values)))
+    return tuple(normalized)
+
+
+def catalog_cache_key(name, request, version=None):
+    if version is None:
+        version = catalog_version()
+    # Paginated responses carry absolute next/previous links and image URLs,
+    # so the host and scheme are part of the key as well.
+    raw = repr((request.scheme, request.get_host(), normalize_query_params(request.GET)))
+    digest = hashlib.md5(raw.encode("utf-8")).hexdigest()
+    return f"store:{name}:v{version}:{digest}"
+
+
+def product_cache_key(request, field, value, version):
+    """Key of one product row, looked up by "id" or "slug"."""
+    # Rows carry absolute image URLs, hence the host and scheme.
+    origin = hashlib.md5(f"{request.scheme}://{request.get_host()}".encode("utf-8")).hexdigest()
+    return f"store:product:v{version}:{origin}:{field}:{value}"
+
+
+def record(name, outcome, count=1):
+    with _stats_lock:
+        _stats[(name, outcome)] += count
+
+
+def cache_stats():
+    """Hit/miss counters for this process, keyed by view name."""
+    with _stats_lock:
+        snapshot = dict(_stats)
+    stats = {}
+    for (name, outcome), count in snapshot.items():
+        stats.setdefault(name, {"hits": 0, "misses": 0})[outcome] = count
+    return stats
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def cached_catalog_response(name):
+    """Cache successful GET responses of a catalog view by query + version.
+
+    Goes between `@api_view` and the view function. Sets `X-Cache: HIT/MISS`
+    on the response.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != "GET":
+                return view(request, *args, **kwargs)
+
+            cache = get_cache()
+            key = catalog_cache_key(name, request)
+            data = cache.get(key)
+            if data is not None:
+                record(name, "hits")
+                response = Response(data)
+                response["X-Cache"] = "HIT"
+                return response
+
+            record(name, "misses")
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, cache_timeout())
+            response["X-Cache"] = "MISS"
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,118 @@
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .cache import TAXONOMY, catalog_cache_key, catalog_changed_at, catalog_version
+from .models import Product
+
+
+# Conditional GET support for the catalog endpoints.
+#
+# ETags and Last-Modified dates are derived from catalog versions and
+# `Product.updated_at` without running the serializer, so Django's
+# `condition` decorator can answer `304 Not Modified` before the view runs.
+# ETags are weak because the body may be re-encoded (e.g. compressed) on the
+# way out; weak comparison is what If-None-Match uses anyway.
+
+
+def weak_etag(*parts):
+    digest = hashlib.md5(repr(parts).encode("utf-8")).hexdigest()
+    return f'W/"{digest}"'
+
+
+def catalog_etag(name):
+    """ETag for a catalog list: changes whenever the catalog version does."""
+
+    def etag_func(request, *args, **kwargs):
+        # The cache key already covers version, host and normalized query.
+        return weak_etag(catalog_cache_key(name, request), request.META.get("HTTP_ACCEPT", ""))
+
+    return etag_func
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    return catalog_changed_at()
+
+
+def product_stamp(request, slug):
+    """(id, updated_at) of the active product, looked up once per request."""
+    if not hasattr(request, "_product_stamp"):
+        request._product_stamp = (
+            Product.objects.filter(slug=slug, is_active=True).values_list("id", "updated_at").first()
+        )
+    return request._product_stamp
+
+
+def prefetch_product_stamp(view):
+    """Look the stamp up with the async ORM before an async detail view.
+
+    `condition` calls the ETag and Last-Modified functions synchronously, and
+    sync ORM calls aren't allowed on the event loop; with the stamp already
+    memoized on the request they don't query.
+    """
+
+    @wraps(view)
+    async def wrapper(request, slug, *args, **kwargs):
+        request._product_stamp = (
+            await Product.objects.filter(slug=slug, is_active=True).values_list("id", "updated_at").afirst()
+        )
+        return await view(request, slug, *args, **kwargs)
+
+    return wrapper
+
+
+def product_etag(request, slug):
+    stamp = product_stamp(request, slug)
+    if stamp is None:
+        return None
+    # Brand and category are nested into the detail payload, so their
+    # version is part of the tag as well.
+    return weak_etag(stamp, catalog_version(TAXONOMY), request.get_host(), request.META.get("HTTP_ACCEPT", ""))
+
+
+def product_last_modified(request, slug):
+    stamp = product_stamp(request, slug)
+    if stamp is None:
+        return None
+    return max(stamp[1], catalog_changed_at(TAXONOMY))
+
+
+def cache_policy(name):
+    """Apply the STORE_CACHE_CONTROL policy for `name`, 304s included.
+
+    Must be the outermost decorator so the `condition` short-circuit gets it too.
+    """
+
+    def apply(request, response):
+        policy = getattr(settings, "STORE_CACHE_CONTROL", {}).get(name)
+        if policy and request.method in ("GET", "HEAD") and response.status_code in (200, 304):
+            patch_cache_control(response, **policy)
+        return response
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+
+            @wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                return apply(request, await view(request, *args, **kwargs))
+
+        else:
+
+            @wraps(view)
+            def wrapper(request, *args, **kwargs):
+                return apply(request, view(request, *args, **kwargs))
+
+        return wrapper
+
+    return decorator
+
+
+def conditional_catalog_list(name):
+    return condition(etag_func=catalog_etag(name), last_modified_func=catalog_last_modified)
+
+
+conditional_product_detail = condition(etag_func=product_etag, last_modified_func=product_last_modified)
@@ -0,0 +1,133 @@
+import json
+from urllib.parse import urljoin
+
+from django.conf import settings
+
+from .models import ProductDocument
+from .querysets import PRODUCT_ORDERINGS, product_queryset
+from .renderers import FastJSONRenderer, fast_json_enabled, orjson
+from .rows import sparse_fieldset
+from .serializers import ProductDetailSerializer
+
+
+# Denormalized read model of the catalog (STORE_PRODUCT_DOCUMENTS).
+#
+# Every active product has a ProductDocument row holding its detail payload,
+# rendered once by ProductDetailSerializer, next to the columns product_list
+# filters and orders on. Detail and list reads then come from that one table:
+# no brand/category join and no serializer, the detail body goes out as is.
+#
+# Documents are rendered against a placeholder origin; the absolute image
+# URLs get the request's scheme and host when served. Writes that go through
+# save() are picked up by the signals in store/signals.py; queryset updates
+# (checkout, the inventory reconciler, admin bulk actions, image manifests)
+# call refresh_documents() themselves. Bulk imports, or turning the setting
+# on, need `manage.py rebuild_product_documents`.
+
+DOCUMENT_ORIGIN = "http://product-document.invalid"
+DOCUMENT_BATCH_SIZE = 500
+
+# Columns an upsert rewrites.
+DOCUMENT_FIELDS = ["brand_id", "category_id", "price", "created_at", "updated_at", "body"]
+
+
+def documents_enabled():
+    return getattr(settings, "STORE_PRODUCT_DOCUMENTS", False)
+
+
+class DocumentRequest:
+    """Enough of a request for the serializer to build absolute URLs."""
+
+    def build_absolute_uri(self, location=None):
+        return urljoin(DOCUMENT_ORIGIN, location or "/")
+
+
+def render(product):
+    data = ProductDetailSerializer(product, context={"request": DocumentRequest()}).data
+    return FastJSONRenderer().render(data).decode("utf-8")
+
+
+def build_document(product):
+    return ProductDocument(
+        id=product.pk,
+        brand_id=product.brand_id,
+        category_id=product.category_id,
+        price=product.price,
+        created_at=product.created_at,
+        updated_at=product.updated_at,
+        body=render(product),
+    )
+
+
+def refresh_documents(product_ids):
+    """Re-render the documents of `product_ids`, dropping inactive or deleted ones."""
+    if not documents_enabled():
+        return
+    product_ids = list(product_ids)
+    for start in range(0, len(product_ids), DOCUMENT_BATCH_SIZE):
+        batch = product_ids[start : start + DOCUMENT_BATCH_SIZE]
+        documents = [build_document(product) for product in product_queryset().filter(id__in=batch)]
+        ProductDocument.objects.filter(id__in=batch).exclude(id__in=[doc.id for doc in documents]).delete()
+        ProductDocument.objects.bulk_create(
+            documents, update_conflicts=True, unique_fields=["id"], update_fields=DOCUMENT_FIELDS
+        )
+
+
+def rebuild_documents(batch_size=DOCUMENT_BATCH_SIZE):
+    """Replace every document; returns how many were written.
+
+    Meant to run inside a transaction, so readers see the old set until the
+    new one is complete.
+    """
+    ProductDocument.objects.all().delete()
+    count, last_id = 0, 0
+    while True:
+        products = list(product_queryset().filter(id__gt=last_id).order_by("id")[:batch_size])
+        if not products:
+            return count
+        ProductDocument.objects.bulk_create(build_document(product) for product in products)
+        count += len(products)
+        last_id = products[-1].id
+
+
+def serves_documents(request):
+    """Documents hold the default representation only; sparse fieldsets skip them."""
+    return documents_enabled() and sparse_fieldset(request) == (None, None)
+
+
+def filtered_documents(request):
+    """views.filtered_products() over documents; None when the request searches."""
+    params = request.GET
+    if params.get("search"):
+        return None
+    documents = ProductDocument.objects.all()
+    if params.get("category"):
+        documents = documents.filter(category_id=params["category"])
+    if params.get("brand"):
+        documents = documents.filter(brand_id=params["brand"])
+    ordering = params.get("ordering")
+    if ordering in PRODUCT_ORDERINGS:
+        return documents.order_by(ordering, "id")
+    return documents.order_by("id")
+
+
+def document_rows(documents):
+    # The columns keyset cursors are built from, plus the payload.
+    return documents.values("id", "price", "created_at", "body")
+
+
+def document_content(request, bodies):
+    """`bodies` as one JSON array, with the request's origin in the URLs."""
+    content = ("[" + ",".join(bodies) + "]").encode("utf-8")
+    return content.replace(DOCUMENT_ORIGIN.encode("ascii"), f"{request.scheme}://{request.get_host()}".encode("utf-8"))
+
+
+def document_data(request, bodies):
+    """The payloads of `bodies`, parsed, for responses that render them again."""
+    content = document_content(request, bodies)
+    return orjson.loads(content) if fast_json_enabled() else json.loads(content)
+
+
+def document_detail_content(request, body):
+    """One document's payload, ready to send as application/json."""
+    return document_content(request, [body])[1:-1]
@@ -0,0 +1,175 @@
+import asyncio
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .models import Product
+from .renderers import FastJSONRenderer
+from .rows import borrowed_fields, parse_ids
+
+
+# Live stock, price and is_active changes for /api/products/events/.
+#
+# Writes that change those fields publish an event once their transaction
+# commits: product saves (store/signals.py), checkout's stock decrement, the
+# admin bulk actions and the inventory reconciler. An event is the product's
+# id plus the fields it sets, e.g. {"id": 7, "stock": 3}; checkout only knows
+# the new stock, saves send all three.
+#
+# The backend (STORE_EVENTS_BACKEND) hands events to the subscriptions of the
+# streams open in this process (store/streams.py). LocalEventBackend is
+# in-process, so a stream only hears about writes made by the same process:
+# it fits a single ASGI worker taking all writes. Several processes need a
+# backend that carries events between them (Redis pub/sub, Postgres
+# LISTEN/NOTIFY) and implements the same three methods.
+
+EVENT_FIELDS = ("stock", "price", "is_active")
+
+# Product ids per snapshot query.
+EVENT_BATCH_SIZE = 500
+
+
+class Subscription:
+    """Events for a set of product ids, coalesced per product until read.
+
+    Lives on the event loop of the stream that created it; backends deliver
+    from other threads through `loop.call_soon_threadsafe`. However many
+    events arrive between two reads, a subscription holds at most one merged
+    event per product.
+    """
+
+    def __init__(self, product_ids):
+        self.product_ids = frozenset(product_ids)
+        self.loop = asyncio.get_running_loop()
+        self.pending = {}
+        self.ready = asyncio.Event()
+        self.closed = False
+
+    def push(self, event):
+        self.pending.setdefault(event["id"], {}).update(event)
+        self.ready.set()
+
+    def close(self):
+        self.closed = True
+        self.ready.set()
+
+    async def next(self, timeout):
+        """Events since the last call; [] after `timeout` quiet seconds, None once closed."""
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except TimeoutError:
+            return []
+        if self.closed:
+            return None
+        self.ready.clear()
+        events, self.pending = list(self.pending.values()), {}
+        return events
+
+
+def deliver(batch):
+    for subscription, event in batch:
+        subscription.push(event)
+
+
+class LocalEventBackend:
+    """In-process pub/sub: published events go to this process's subscriptions."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = defaultdict(set)
+
+    def subscribe(self, product_ids):
+        subscription = Subscription(product_ids)
+        with self.lock:
+            for product_id in subscription.product_ids:
+                self.subscriptions[product_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for product_id in subscription.product_ids:
+                subscribers = self.subscriptions.get(product_id)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self.subscriptions[product_id]
+
+    def publish(self, events):
+        # One wakeup per event loop, however many subscribers an event has.
+        batches = defaultdict(list)
+        with self.lock:
+            for event in events:
+                for subscription in self.subscriptions.get(event["id"], ()):
+                    batches[subscription.loop].append((subscription, event))
+        for loop, batch in batches.items():
+            try:
+                loop.call_soon_threadsafe(deliver, batch)
+            except RuntimeError:  # the loop has shut down
+                pass
+
+
+@lru_cache(maxsize=None)
+def _load_backend(path):
+    return import_string(path)()
+
+
+def get_event_backend():
+    return _load_backend(getattr(settings, "STORE_EVENTS_BACKEND", "store.events.LocalEventBackend"))
+
+
+def product_event(product_id, stock, price, is_active):
+    return {
+        "id": product_id,
+        "stock": stock,
+        # Formatted like the catalog endpoints format it.
+        "price": borrowed_fields()["price"].to_representation(price),
+        "is_active": is_active,
+    }
+
+
+def publish(events):
+    """Hand `events` to the backend once the current transaction commits."""
+    events = list(events)
+    if events:
+        transaction.on_commit(lambda: get_event_backend().publish(events))
+
+
+def product_snapshot(product_ids):
+    """Events with the current values of `product_ids` (unknown ids are left out)."""
+    product_ids = list(product_ids)
+    events = []
+    for start in range(0, len(product_ids), EVENT_BATCH_SIZE):
+        rows = Product.objects.filter(id__in=product_ids[start : start + EVENT_BATCH_SIZE])
+        events.extend(product_event(*row) for row in rows.values_list("id", *EVENT_FIELDS))
+    return events
+
+
+def publish_products(product_ids):
+    """Publish the current values of `product_ids`, for updates that don't send post_save."""
+    publish(product_snapshot(product_ids))
+
+
+def event_ids(params):
+    """The product ids a stream subscribes to, from `?ids=1,2,3`."""
+    ids = [part.strip() for part in params.get("ids", "").split(",") if part.strip()]
+    if not ids:
+        raise ValueError("Pass the product ids to follow, e.g. ?ids=1,2.")
+    limit = getattr(settings, "STORE_EVENT_STREAM_MAX_IDS", 100)
+    if len(ids) > limit:
+        raise ValueError(f"At most {limit} ids per stream.")
+    return list(dict.fromkeys(parse_ids(ids)))
+
+
+def retry_field():
+    """How long EventSource waits before reconnecting, as an SSE field."""
+    return f"retry: {round(getattr(settings, 'STORE_EVENT_STREAM_RETRY', 5) * 1000)}\n\n".encode("ascii")
+
+
+def format_events(events):
+    """`events` as server-sent events of type "product"."""
+    renderer = FastJSONRenderer()
+    return b"".join(b"event: product\ndata: " + renderer.render(event) + b"\n\n" for event in events)
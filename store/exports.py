@@ -0,0 +1,188 @@
+import csv
+from datetime import datetime, time
+from itertools import chain
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.renderers import BaseRenderer
+
+from .models import Order, OrderItem, Product
+
+
+# Streaming exports of orders (with their items) and products.
+#
+# Rows are read with `.iterator(chunk_size=...)`, which also runs the items
+# prefetch once per chunk, and are written out as they are read, so memory
+# stays flat however many rows there are. NDJSON has one order or product
+# per line; the orders CSV has one row per item, repeating the order
+# columns. Served by the export views in store/views.py and by
+# `manage.py export`.
+
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_FORMATS = ("ndjson", "csv")
+
+ORDER_COLUMNS = ["id", "created_at", "status", "user_id", "customer_name", "customer_email", "total_price"]
+ITEM_COLUMNS = ["product_id", "product_name", "quantity", "unit_price"]
+PRODUCT_COLUMNS = [
+    "id", "name", "slug", "brand", "category", "price", "stock", "is_active", "created_at", "updated_at",
+]
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Lets the export views negotiate ?format=ndjson; renders error bodies."""
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return (DjangoJSONEncoder().encode(data) + "\n").encode()
+
+
+class CSVRenderer(BaseRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        rows = data.items() if isinstance(data, dict) else [("detail", data)]
+        return "".join(map(CSVLines().row, rows)).encode()
+
+
+# Text cells starting with these are read as formulas by spreadsheets.
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def spreadsheet_safe(value):
+    """Quote text a spreadsheet would run as a formula (customer names, say)."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class CSVLines:
+    """A csv.writer that returns each formatted row instead of writing it."""
+
+    def __init__(self):
+        self.writer = csv.writer(self)
+
+    def write(self, value):
+        return value
+
+    def row(self, values):
+        return self.writer.writerow(map(spreadsheet_safe, values))
+
+
+def parse_bound(value, end=False):
+    """An ISO date or datetime. A bare date as `end` covers the whole day."""
+    day = parse_date(value)
+    moment = datetime.combine(day, time.max if end else time.min) if day else parse_datetime(value)
+    if moment is None:
+        raise ValueError(f"Invalid date or datetime: {value!r}")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_range(since=None, until=None):
+    """(since, until) from query or command-line strings; raises ValueError."""
+    return (
+        parse_bound(since) if since else None,
+        parse_bound(until, end=True) if until else None,
+    )
+
+
+def date_range(queryset, field, since=None, until=None):
+    if since:
+        queryset = queryset.filter(**{f"{field}__gte": since})
+    if until:
+        queryset = queryset.filter(**{f"{field}__lte": until})
+    return queryset
+
+
+def order_export_queryset(since=None, until=None):
+    items = (
+        OrderItem.objects.select_related("product")
+        .only("order_id", "quantity", "unit_price", "product__name")
+        .order_by("id")
+    )
+    orders = Order.objects.only(*ORDER_COLUMNS).prefetch_related(Prefetch("items", queryset=items))
+    return date_range(orders.order_by("id"), "created_at", since, until)
+
+
+def product_export_queryset(since=None, until=None):
+    products = Product.objects.order_by("id").values(
+        *(column for column in PRODUCT_COLUMNS if column not in ("brand", "category")),
+        brand_name=F("brand__name"),
+        category_name=F("category__name"),
+    )
+    return date_range(products, "updated_at", since, until)
+
+
+def item_values(item):
+    return [item.product_id, item.product.name, item.quantity, item.unit_price]
+
+
+def take_items(order):
+    """The prefetched items, dropped from the order as they're read.
+
+    The prefetch caches each order on its items, and the order<->items cycle
+    would otherwise leave every exported chunk for the cyclic GC, so memory
+    grew with the export instead of staying at one chunk.
+    """
+    return order._prefetched_objects_cache.pop("items")
+
+
+def order_lines(orders, fmt):
+    if fmt == "csv":
+        writer = CSVLines()
+        yield writer.row(ORDER_COLUMNS + ITEM_COLUMNS)
+        for order in orders:
+            values = [getattr(order, column) for column in ORDER_COLUMNS]
+            # Orders without items still get a row.
+            for item in take_items(order) or [None]:
+                yield writer.row(values + (item_values(item) if item else [""] * len(ITEM_COLUMNS)))
+    else:
+        encoder = DjangoJSONEncoder()
+        for order in orders:
+            record = {column: getattr(order, column) for column in ORDER_COLUMNS}
+            record["items"] = [dict(zip(ITEM_COLUMNS, item_values(item))) for item in take_items(order)]
+            yield encoder.encode(record) + "\n"
+
+
+def product_lines(products, fmt):
+    products = ({**row, "brand": row["brand_name"], "category": row["category_name"]} for row in products)
+    if fmt == "csv":
+        writer = CSVLines()
+        return chain(
+            [writer.row(PRODUCT_COLUMNS)],
+            (writer.row([row[column] for column in PRODUCT_COLUMNS]) for row in products),
+        )
+    encoder = DjangoJSONEncoder()
+    return (encoder.encode({column: row[column] for column in PRODUCT_COLUMNS}) + "\n" for row in products)
+
+
+def batched(lines, size):
+    """Join lines into strings of `size` lines, so each write carries a chunk."""
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+
+def export_orders(fmt, since=None, until=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Text chunks of the orders export, lazily; `since`/`until` come from parse_range()."""
+    orders = order_export_queryset(since, until).iterator(chunk_size=chunk_size)
+    return batched(order_lines(orders, fmt), chunk_size)
+
+
+def export_products(fmt, since=None, until=None, chunk_size=EXPORT_CHUNK_SIZE):
+    products = product_export_queryset(since, until).iterator(chunk_size=chunk_size)
+    return batched(product_lines(products, fmt), chunk_size)
+
+
+EXPORTS = {"orders": export_orders, "products": export_products}
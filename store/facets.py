@@ -0,0 +1,77 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, Value, When
+
+
+# Facet counts for the product sidebar, from one grouped query.
+#
+# The query groups the searched catalog by (brand, category, price bucket)
+# without applying the brand and category filters; the counts are folded
+# from those groups in Python. That makes the facets disjunctive: brand
+# counts respect the category filter but not the brand filter, so the
+# sidebar can show what picking another brand would give, and vice versa.
+# Price bucket counts and the total respect both.
+
+DEFAULT_PRICE_BUCKETS = (25, 50, 100, 250, 500)
+
+
+def price_bounds():
+    return tuple(getattr(settings, "STORE_PRICE_BUCKETS", DEFAULT_PRICE_BUCKETS))
+
+
+def price_bucket(bounds):
+    """Index of the price bucket: 0 below bounds[0], len(bounds) above the last."""
+    return Case(
+        *(When(price__lt=Decimal(bound), then=Value(index)) for index, bound in enumerate(bounds)),
+        default=Value(len(bounds)),
+        output_field=IntegerField(),
+    )
+
+
+def matches(value, wanted):
+    return not wanted or str(value) == str(wanted)
+
+
+def facet_counts(products, brand=None, category=None):
+    """Brand, category and price-bucket counts for `products`.
+
+    `products` should already be searched but not filtered by brand or
+    category; those filters are passed in and applied while folding.
+    """
+    bounds = price_bounds()
+    groups = (
+        products.order_by()
+        .annotate(price_bucket=price_bucket(bounds))
+        .values("brand_id", "brand__name", "category_id", "category__name", "price_bucket")
+        .annotate(count=Count("id"))
+    )
+
+    brands, categories = {}, {}
+    buckets = [0] * (len(bounds) + 1)
+    total = 0
+    for group in groups:
+        in_brand = matches(group["brand_id"], brand)
+        in_category = matches(group["category_id"], category)
+        count = group["count"]
+        if in_category:
+            entry = brands.setdefault(
+                group["brand_id"], {"id": group["brand_id"], "name": group["brand__name"], "count": 0}
+            )
+            entry["count"] += count
+        if in_brand:
+            entry = categories.setdefault(
+                group["category_id"], {"id": group["category_id"], "name": group["category__name"], "count": 0}
+            )
+            entry["count"] += count
+        if in_brand and in_category:
+            buckets[group["price_bucket"]] += count
+            total += count
+
+    edges = (0, *bounds, None)
+    return {
+        "count": total,
+        "brands": sorted(brands.values(), key=lambda entry: (-entry["count"], entry["name"])),
+        "categories": sorted(categories.values(), key=lambda entry: (-entry["count"], entry["name"])),
+        "price": [{"min": edges[i], "max": edges[i + 1], "count": count} for i, count in enumerate(buckets)],
+    }
@@ -0,0 +1,128 @@
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+from rest_framework.exceptions import Throttled
+from rest_framework.request import Request
+
+from .images import _init_worker
+
+
+# Password hashing off the request threads, with backpressure.
+#
+# A PBKDF2 hash keeps a core busy for a good fraction of a second. Run
+# inline, a burst of sign-ups or logins occupies every thread of a gunicorn
+# worker and the catalog requests queue behind it. Here hashes go through a
+# small pool per process (STORE_HASHING_POOL: "thread", "process" or
+# "inline"), and at most STORE_HASHING_MAX_PENDING may be running or waiting
+# for it; beyond that the request fails at once with 429 and Retry-After.
+# A request whose hash is admitted still waits for it on its own thread, so
+# the pool doesn't free threads: it bounds how many can be tied up by
+# hashing, and how many cores hashing takes. Keep the limit below the
+# threads per worker (GUNICORN_THREADS) so some are always left for other
+# requests.
+#
+# `register` hashes through hash_password(); logins, including the JWT
+# token endpoint, through PooledModelBackend. Only the API turns HashingBusy
+# into a 429; the Django admin login hashes inline when the pool is full.
+
+
+class HashingBusy(Throttled):
+    default_detail = "Too many sign-ins in progress, please retry shortly."
+
+
+class HashingPool:
+    def __init__(self, mode, workers, max_pending):
+        if mode == "process":
+            # "spawn" for the same reason as the image pool (store/images.py).
+            self.executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        atexit.register(self.executor.shutdown, wait=False)
+        self.slots = threading.BoundedSemaphore(max_pending)
+
+    def run(self, func, *args):
+        if not self.slots.acquire(blocking=False):
+            raise HashingBusy(wait=1)
+        try:
+            return self.executor.submit(func, *args).result()
+        finally:
+            self.slots.release()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def pool_settings():
+    return (
+        getattr(settings, "STORE_HASHING_POOL", "thread"),
+        getattr(settings, "STORE_HASHING_WORKERS", 1),
+        getattr(settings, "STORE_HASHING_MAX_PENDING", 2),
+    )
+
+
+def run_hasher(func, *args):
+    config = pool_settings()
+    if config[0] == "inline":
+        return func(*args)
+    with _pools_lock:
+        if config not in _pools:
+            _pools[config] = HashingPool(*config)
+        pool = _pools[config]
+    return pool.run(func, *args)
+
+
+def hash_password(raw_password):
+    return run_hasher(make_password, raw_password)
+
+
+class PooledModelBackend(ModelBackend):
+    """ModelBackend with the password check run through the hashing pool."""
+
+    def run(self, request, func, *args):
+        try:
+            return run_hasher(func, *args)
+        except HashingBusy:
+            if isinstance(request, Request):
+                raise
+            # Outside a DRF view (the admin login) nothing would turn it into a 429.
+            return func(*args)
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway so unknown usernames take as long as wrong passwords.
+            self.run(request, make_password, password)
+            return None
+        if not (self.run(request, check_password, password, user.password) and self.user_can_authenticate(user)):
+            return None
+        if needs_rehash(user.password):
+            user.password = self.run(request, make_password, password)
+            user.save(update_fields=["password"])
+        return user
+
+
+def needs_rehash(encoded):
+    # What check_password's setter does: upgrade to the preferred hasher.
+    preferred = get_hasher()
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
@@ -0,0 +1,190 @@
+import atexit
+import logging
+import multiprocessing
+import os
+import posixpath
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+
+logger = logging.getLogger(__name__)
+
+# Derivative images for Product.image_file.
+#
+# Each upload gets resized copies at STORE_IMAGE_WIDTHS in every format of
+# STORE_IMAGE_FORMATS that this Pillow build can write. They are stored next
+# to the original under products/variants/<name>/<width>.<ext> and recorded
+# on Product.image_variants:
+#
+#     {"source": "products/x.jpg",
+#      "formats": {"webp": {"320": "products/variants/x/320.webp", ...}, ...}}
+#
+# Resizing is CPU-bound, so uploads hand it to a process pool
+# (STORE_IMAGE_PIPELINE="process"); "sync" does it inline and "off" skips it.
+
+FORMAT_OPTIONS = {
+    "jpeg": {"ext": "jpg", "pillow": "JPEG", "options": {"quality": 82, "optimize": True, "progressive": True}},
+    "webp": {"ext": "webp", "pillow": "WEBP", "options": {"quality": 80, "method": 4}},
+    "avif": {"ext": "avif", "pillow": "AVIF", "options": {"quality": 60}},
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_widths():
+    return tuple(getattr(settings, "STORE_IMAGE_WIDTHS", (320, 640, 1024)))
+
+
+def variant_formats():
+    wanted = getattr(settings, "STORE_IMAGE_FORMATS", ("webp", "jpeg"))
+    return tuple(fmt for fmt in wanted if fmt in FORMAT_OPTIONS and (fmt == "jpeg" or features.check(fmt)))
+
+
+def variant_dir(source_name):
+    stem = posixpath.splitext(posixpath.basename(source_name))[0]
+    return posixpath.join(posixpath.dirname(source_name), "variants", stem)
+
+
+def build_variants(source_name, widths, formats):
+    """Write resized copies of `source_name`; return the manifest.
+
+    Runs in a worker process, so it only takes and returns plain data.
+    Widths wider than the original are skipped rather than upscaled; the
+    original width is always included so small images still get variants.
+    """
+    with default_storage.open(source_name, "rb") as fh:
+        original = ImageOps.exif_transpose(Image.open(fh))
+        original.load()
+
+    if original.mode not in ("RGB", "RGBA"):
+        original = original.convert("RGBA" if "transparency" in original.info else "RGB")
+
+    targets = sorted({w for w in widths if w < original.width} | {min(original.width, max(widths))})
+    out_dir = variant_dir(source_name)
+    manifest = {"source": source_name, "formats": {}}
+
+    for width in targets:
+        height = max(1, round(original.height * width / original.width))
+        resized = original.resize((width, height), Image.Resampling.LANCZOS)
+        for fmt in formats:
+            spec = FORMAT_OPTIONS[fmt]
+            image = resized.convert("RGB") if fmt == "jpeg" else resized
+            buffer = BytesIO()
+            image.save(buffer, spec["pillow"], **spec["options"])
+            name = posixpath.join(out_dir, f"{width}.{spec['ext']}")
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            saved = default_storage.save(name, ContentFile(buffer.getvalue()))
+            manifest["formats"].setdefault(fmt, {})[str(width)] = saved
+
+    return manifest
+
+
+def _init_worker():
+    # Spawned workers start from a fresh interpreter without Django set up.
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+        django.setup()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = getattr(settings, "STORE_IMAGE_WORKERS", None) or max(1, (os.cpu_count() or 2) // 2)
+            # "spawn" rather than fork: forking a threaded web worker can
+            # deadlock on locks held by other threads.
+            _executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+            atexit.register(_executor.shutdown, wait=False)
+        return _executor
+
+
+def manifest_files(manifest):
+    return {name for by_width in (manifest or {}).get("formats", {}).values() for name in by_width.values()}
+
+
+def delete_variants(manifest, keep=None):
+    """Delete the files of `manifest` that aren't in `keep`, once the transaction commits."""
+    stale = manifest_files(manifest) - manifest_files(keep)
+
+    def delete():
+        for name in stale:
+            try:
+                default_storage.delete(name)
+            except OSError:
+                logger.warning("Could not delete image variant %s", name, exc_info=True)
+
+    if stale:
+        transaction.on_commit(delete)
+
+
+def save_manifest(product_id, manifest):
+    from .cache import bump_catalog_version
+    from .documents import refresh_documents
+    from .models import Product
+    from .transactions import locking_atomic
+
+    with locking_atomic():
+        # Only record it if the product still points at the image it was built from.
+        rows = Product.objects.select_for_update().filter(pk=product_id, image_file=manifest["source"])
+        previous = rows.values_list("image_variants", flat=True).first()
+        # updated_at feeds the detail ETag (store/conditional.py).
+        if previous is not None and rows.update(image_variants=manifest, updated_at=timezone.now()):
+            delete_variants(previous, keep=manifest)
+            refresh_documents([product_id])
+    bump_catalog_version()
+
+
+def _manifest_ready(product_id, future):
+    close_old_connections()
+    try:
+        save_manifest(product_id, future.result())
+    except Exception:
+        logger.exception("Building image variants for product %s failed", product_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(product):
+    """Build variants for a product whose image changed, per STORE_IMAGE_PIPELINE."""
+    mode = getattr(settings, "STORE_IMAGE_PIPELINE", "process")
+    if mode == "off":
+        return
+
+    source_name = product.image_file.name
+    args = (source_name, variant_widths(), variant_formats())
+
+    if mode == "sync":
+        save_manifest(product.pk, build_variants(*args))
+        return
+
+    def submit():
+        future = get_executor().submit(build_variants, *args)
+        future.add_done_callback(lambda f: _manifest_ready(product.pk, f))
+
+    transaction.on_commit(submit)
+
+
+def srcset(manifest, build_url):
+    """{format: "url 320w, url 640w"} for a Product.image_variants manifest."""
+    result = {}
+    for fmt, by_width in (manifest or {}).get("formats", {}).items():
+        entries = sorted(by_width.items(), key=lambda item: int(item[0]))
+        result[fmt] = ", ".join(f"{build_url(default_storage.url(name))} {width}w" for width, name in entries)
+    return result
@@ -0,0 +1,205 @@
+import atexit
+import logging
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+# Stock reservations for checkout, off the Product rows.
+#
+# With STORE_INVENTORY_BACKEND unset, checkout locks and decrements the
+# Product rows as before. With a backend, it reserves the units in the
+# backend's counters instead (all lines or none), writes the order, and
+# commits the hold; a hold that isn't committed or released within
+# STORE_INVENTORY_HOLD_TTL seconds (a crashed request) goes back to stock.
+# A reconciler periodically writes committed sales to Product.stock, bumps
+# the catalog version, and resyncs the counters from the database, which
+# also picks up stock edited in the admin.
+#
+# LocalInventoryBackend keeps the counters in process memory, so it is only
+# correct when one process takes all checkouts (WEB_CONCURRENCY=1, or a
+# dedicated checkout worker). Several processes need a backend on shared
+# storage that implements the same four methods.
+
+
+class OutOfStock(Exception):
+    def __init__(self, product_id):
+        super().__init__(product_id)
+        self.product_id = product_id
+
+
+@dataclass
+class Hold:
+    id: str
+    lines: dict
+    expires_at: float
+
+
+class InventoryBackend:
+    """reserve/commit/release on stock counters, plus reconcile()."""
+
+    def reserve(self, lines, ttl=None):
+        """Hold `lines` ({product_id: quantity}) or raise OutOfStock."""
+        raise NotImplementedError
+
+    def commit(self, hold):
+        raise NotImplementedError
+
+    def release(self, hold):
+        raise NotImplementedError
+
+    def reconcile(self):
+        raise NotImplementedError
+
+
+class LocalInventoryBackend(InventoryBackend):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reconcile_lock = threading.Lock()
+        # Units neither held nor sold, per product loaded so far.
+        self.available = {}
+        self.holds = {}
+        # Committed units not yet written to Product.stock.
+        self.sold = Counter()
+        self.reconciler = None
+
+    def load(self, product_ids):
+        from .models import Product
+
+        stock = dict(Product.objects.filter(id__in=product_ids, is_active=True).values_list("id", "stock"))
+        with self.lock:
+            for product_id, units in stock.items():
+                self.available.setdefault(product_id, units)
+
+    # The two helpers below are called with the lock held.
+
+    def restock(self, lines, sign=1):
+        for product_id, quantity in lines.items():
+            # Products dropped by reconcile() are reloaded from the database.
+            if product_id in self.available:
+                self.available[product_id] += sign * quantity
+
+    def expire_holds(self, now):
+        for hold in [hold for hold in self.holds.values() if hold.expires_at <= now]:
+            del self.holds[hold.id]
+            self.restock(hold.lines)
+
+    def reserve(self, lines, ttl=None):
+        self.start_reconciler()
+        missing = [product_id for product_id in lines if product_id not in self.available]
+        if missing:
+            self.load(missing)
+
+        now = time.monotonic()
+        ttl = ttl or getattr(settings, "STORE_INVENTORY_HOLD_TTL", 60)
+        with self.lock:
+            self.expire_holds(now)
+            for product_id, quantity in sorted(lines.items()):
+                if self.available.get(product_id, 0) < quantity:
+                    raise OutOfStock(product_id)
+            for product_id, quantity in lines.items():
+                self.available[product_id] -= quantity
+            hold = Hold(uuid.uuid4().hex, dict(lines), now + ttl)
+            self.holds[hold.id] = hold
+        return hold
+
+    def commit(self, hold):
+        with self.lock:
+            if self.holds.pop(hold.id, None) is None:
+                # Expired and returned to stock in the meantime; the units
+                # are sold all the same.
+                logger.warning("Committing expired inventory hold %s", hold.id)
+                self.restock(hold.lines, -1)
+            self.sold.update(hold.lines)
+
+    def release(self, hold):
+        with self.lock:
+            if self.holds.pop(hold.id, None) is not None:
+                self.restock(hold.lines)
+
+    def reconcile(self):
+        """Write sales to Product.stock and resync the counters; return units written."""
+        from .cache import bump_catalog_version
+        from .documents import refresh_documents
+        from .events import publish
+        from .models import Product
+
+        with self.reconcile_lock:
+            with self.lock:
+                sold, self.sold = self.sold, Counter()
+                product_ids = list(self.available)
+            try:
+                with transaction.atomic():
+                    now = timezone.now()
+                    for product_id, quantity in sorted(sold.items()):
+                        Product.objects.filter(id=product_id).update(
+                            stock=Greatest(F("stock") - quantity, Value(0)), updated_at=now
+                        )
+                    refresh_documents(sorted(sold))
+            except Exception:
+                with self.lock:
+                    self.sold.update(sold)
+                raise
+            if sold:
+                bump_catalog_version()
+
+            stock = dict(Product.objects.filter(id__in=product_ids, is_active=True).values_list("id", "stock"))
+            publish({"id": product_id, "stock": stock[product_id]} for product_id in sold if product_id in stock)
+            with self.lock:
+                self.expire_holds(time.monotonic())
+                held = Counter()
+                for hold in self.holds.values():
+                    held.update(hold.lines)
+                for product_id in product_ids:
+                    # Deactivated products drop out and are reloaded on demand.
+                    units = stock.get(product_id)
+                    if units is None:
+                        self.available.pop(product_id, None)
+                    else:
+                        self.available[product_id] = units - held[product_id] - self.sold[product_id]
+            return sum(sold.values())
+
+    def start_reconciler(self):
+        interval = getattr(settings, "STORE_INVENTORY_RECONCILE_INTERVAL", 5)
+        if self.reconciler is not None or not interval:
+            return
+        with self.reconcile_lock:
+            if self.reconciler is None:
+                self.reconciler = threading.Thread(
+                    target=self.reconcile_forever, args=(interval,), name="inventory-reconciler", daemon=True
+                )
+                self.reconciler.start()
+                # Don't lose the last few seconds of sales on a clean shutdown.
+                atexit.register(self.reconcile)
+
+    def reconcile_forever(self, interval):
+        while True:
+            time.sleep(interval)
+            close_old_connections()
+            try:
+                self.reconcile()
+            except Exception:
+                logger.exception("Inventory reconciliation failed")
+
+
+@lru_cache(maxsize=None)
+def _load_backend(path):
+    return import_string(path)()
+
+
+def get_inventory_backend():
+    """The configured backend, or None for row-locking checkout."""
+    path = getattr(settings, "STORE_INVENTORY_BACKEND", "")
+    return _load_backend(path) if path else None
@@ -0,0 +1,40 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+
+from store.images import build_variants, save_manifest, variant_formats, variant_widths
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = "Build resized/WebP/AVIF variants for product images (backfill)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Rebuild variants that are already up to date.")
+        parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image_file="").exclude(image_file__isnull=True)
+        jobs = [
+            (product.pk, product.image_file.name)
+            for product in products.only("id", "image_file", "image_variants")
+            if options["force"] or product.image_variants.get("source") != product.image_file.name
+        ]
+        if not jobs:
+            self.stdout.write("All product images already have variants.")
+            return
+
+        widths, formats = variant_widths(), variant_formats()
+        built = failed = 0
+        with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+            futures = {pool.submit(build_variants, name, widths, formats): (pk, name) for pk, name in jobs}
+            for future in as_completed(futures):
+                pk, name = futures[future]
+                try:
+                    save_manifest(pk, future.result())
+                    built += 1
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f"{name}: {exc}")
+
+        self.stdout.write(self.style.SUCCESS(f"Built variants for {built} image(s), {failed} failed."))
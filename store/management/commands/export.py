@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store.exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, EXPORTS, parse_range
+
+
+class Command(BaseCommand):
+    help = "Stream orders (with items) or products as NDJSON or CSV, to stdout or a file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=sorted(EXPORTS))
+        parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+        parser.add_argument("--since", help="ISO date or datetime; orders by created_at, products by updated_at")
+        parser.add_argument("--until", help="ISO date or datetime, inclusive (a date covers the whole day)")
+        parser.add_argument("--output", "-o", help="file to write instead of stdout")
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE, help="rows fetched per query")
+
+    def handle(self, *args, **options):
+        try:
+            since, until = parse_range(options["since"], options["until"])
+        except ValueError as exc:
+            raise CommandError(exc)
+        chunks = EXPORTS[options["dataset"]](options["format"], since, until, chunk_size=options["chunk_size"])
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8", newline="") as fh:
+                fh.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
@@ -0,0 +1,341 @@
+import bisect
+import random
+from array import array
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from itertools import islice
+from time import perf_counter
+
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from store.cache import bump_catalog_version
+from store.documents import documents_enabled, rebuild_documents
+from store.models import Brand, Category, Order, OrderItem, Product, ProductDocument
+from store.search import get_search_backend
+
+
+# Everything generated is marked so --reset can find it again.
+PREFIX = "gen"
+EMAIL_DOMAIN = "loadtest.invalid"
+
+def generated(model, field, kind):
+    """Rows of `model` whose `field` has the exact form this command gives it."""
+    return model.objects.filter(**{f"{field}__regex": rf"^{PREFIX}-{kind}-[0-9]+$"})
+
+
+ADJECTIVES = ["Pro", "Ultra", "Elite", "Lite", "Wireless", "Mini", "Max", "Tournament", "Stealth", "Carbon"]
+NOUNS = {
+    "Mouse": ["Mouse", "Gaming Mouse", "Ergonomic Mouse"],
+    "Keyboard": ["Keyboard", "Mechanical Keyboard", "TKL Keyboard"],
+    "Headset": ["Headset", "Headphones", "Earbuds"],
+    "Monitor": ["Monitor", "Display"],
+    "Mousepad": ["Mousepad", "Desk Mat"],
+    "Chair": ["Chair", "Gaming Chair"],
+    "Microphone": ["Microphone", "USB Mic"],
+    "Webcam": ["Webcam", "Stream Camera"],
+    "Controller": ["Controller", "Gamepad"],
+    "Speaker": ["Speakers", "Soundbar"],
+}
+SENTENCES = [
+    "Built for long sessions without fatigue.",
+    "The switches feel crisp and consistent after months of use.",
+    "Setup takes a minute and the companion app is optional.",
+    "Battery life easily covers a full week of evenings.",
+    "It survived a couple of drops from the desk without a scratch.",
+    "The cable is braided and long enough for any desk layout.",
+    "Profiles can be stored on the device itself.",
+    "Latency is low enough for competitive play.",
+    "RGB lighting can be turned off entirely.",
+    "Replacement parts are available from the manufacturer.",
+]
+BRAND_PARTS = (
+    ["Vor", "Nim", "Zen", "Hyper", "Kry", "Aur", "Ox", "Sol", "Pulse", "Ion", "Nova", "Astra"],
+    ["tex", "bus", "ith", "ion", "ora", "ware", "labs", "gear", "is", "on"],
+)
+FIRST_NAMES = ["Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Robin", "Charlie"]
+LAST_NAMES = ["Smith", "Yilmaz", "Garcia", "Kowalski", "Nguyen", "Müller", "Rossi", "Tanaka", "Silva", "Ivanov"]
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def raw_delete(queryset):
+    """DELETE the rows of `queryset` without loading them or sending signals."""
+    return queryset._raw_delete(queryset.db)
+
+
+@contextmanager
+def historical_timestamps(*models):
+    """Let bulk_create store the generated created_at/updated_at values."""
+    fields = [
+        field
+        for model in models
+        for field in model._meta.concrete_fields
+        if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = "Generate a large synthetic catalog (brands, categories, products, users, orders) for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--brands", type=int, default=50)
+        parser.add_argument("--categories", type=int, default=20)
+        parser.add_argument("--products", type=int, default=10000)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--orders", type=int, default=20000)
+        parser.add_argument("--max-items", type=int, default=4, help="Maximum lines per order.")
+        parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of product popularity.")
+        parser.add_argument("--days", type=int, default=365, help="Spread creation dates over this many days.")
+        parser.add_argument(
+            "--until", type=date.fromisoformat, default=None, help="Last creation date, YYYY-MM-DD (default: today)."
+        )
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--reset", action="store_true", help="Delete previously generated data first.")
+
+    def handle(self, *args, **options):
+        if not connection.features.can_return_rows_from_bulk_insert:
+            raise CommandError("The database must return primary keys from bulk inserts (SQLite 3.35+ or Postgres).")
+
+        self.rnd = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        # Dates count back from midnight so a seed gives the same rows all day.
+        until = options["until"] or timezone.now().date()
+        self.now = datetime.combine(until, time.min, tzinfo=dt_timezone.utc)
+        self.days = options["days"]
+
+        if options["reset"]:
+            self.reset()
+        if generated(Product, "slug", "product").exists():
+            raise CommandError("Generated data already exists; run with --reset to replace it.")
+
+        with historical_timestamps(Product, Order):
+            categories = self.stage("categories", self.create_categories, options["categories"])
+            brands = self.stage("brands", self.create_brands, options["brands"])
+            products = self.stage("products", self.create_products, options["products"], brands, categories)
+            users = self.stage("users", self.create_users, options["users"])
+            self.stage(
+                "orders",
+                self.create_orders,
+                options["orders"],
+                products,
+                users,
+                options["max_items"],
+                options["skew"],
+            )
+
+        # bulk_create skips the signals that keep search and caches in sync.
+        get_search_backend().rebuild()
+        if documents_enabled():
+            with transaction.atomic():
+                rebuild_documents()
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS("Done."))
+
+    def stage(self, label, func, *args):
+        start = perf_counter()
+        result = func(*args)
+        count = result if isinstance(result, int) else len(result[0] if isinstance(result, tuple) else result)
+        elapsed = perf_counter() - start
+        rate = count / elapsed if elapsed else count
+        self.stdout.write(f"{label}: {count} in {elapsed:.1f}s ({rate:,.0f}/s)")
+        return result
+
+    def reset(self):
+        """Delete generated rows in primary-key batches, children first.
+
+        Raw deletes: the ORM would load every row and send a post_delete per
+        row to the search, cache, document and event receivers. handle()
+        rebuilds the search index and documents afterwards anyway.
+        """
+        products = generated(Product, "slug", "product")
+        brands = Brand.objects.filter(website__endswith=f".{EMAIL_DOMAIN}")
+        categories = generated(Category, "slug", "category")
+        orders = Order.objects.filter(customer_email__endswith=f"@{EMAIL_DOMAIN}")
+
+        # Stop where the ORM would have (PROTECT) or would have deleted rows
+        # that weren't generated (CASCADE).
+        if OrderItem.objects.filter(product__in=products).exclude(order__in=orders).exists():
+            raise CommandError("Orders that weren't generated reference generated products; delete them first.")
+        others = Product.objects.exclude(pk__in=products)
+        if others.filter(Q(brand__in=brands) | Q(category__in=categories)).exists():
+            raise CommandError("Products that weren't generated use generated brands or categories.")
+
+        self.delete_batches(orders, lambda ids: raw_delete(OrderItem.objects.filter(order_id__in=ids)))
+        self.delete_batches(products, lambda ids: raw_delete(ProductDocument.objects.filter(id__in=ids)))
+        self.delete_batches(brands)
+        self.delete_batches(categories)
+        users = generated(get_user_model(), "username", "user").filter(email__endswith=f"@{EMAIL_DOMAIN}")
+        self.delete_batches(users, self.unlink_users)
+
+    def unlink_users(self, ids):
+        """What deleting users `ids` through the ORM would cascade to."""
+        User = get_user_model()
+        # Orders the generated users placed later, through the API.
+        Order.objects.filter(user_id__in=ids).update(user=None)
+        raw_delete(User.groups.through.objects.filter(user_id__in=ids))
+        raw_delete(User.user_permissions.through.objects.filter(user_id__in=ids))
+        raw_delete(LogEntry.objects.filter(user_id__in=ids))
+
+    def delete_batches(self, queryset, delete_dependents=None):
+        """Raw-delete `queryset` in primary-key batches, calling `delete_dependents(ids)` first."""
+        model, last = queryset.model, 0
+        while ids := list(queryset.filter(pk__gt=last).order_by("pk").values_list("pk", flat=True)[: self.batch_size]):
+            with transaction.atomic():
+                if delete_dependents is not None:
+                    delete_dependents(ids)
+                raw_delete(model.objects.filter(pk__in=ids))
+            last = ids[-1]
+
+    def past(self):
+        return self.now - timedelta(seconds=self.rnd.randint(0, self.days * 86400))
+
+    def bulk_insert(self, model, objects):
+        """Insert in batches, each in its own transaction; yield the saved batches."""
+        for batch in batched(objects, self.batch_size):
+            with transaction.atomic():
+                yield model.objects.bulk_create(batch, batch_size=self.batch_size)
+
+    def create_categories(self, count):
+        kinds = list(NOUNS)
+        categories = (
+            Category(name=f"{kinds[i % len(kinds)]} {i // len(kinds) + 1}", slug=f"{PREFIX}-category-{i}")
+            for i in range(count)
+        )
+        return [(c.pk, c.name.rsplit(" ", 1)[0]) for batch in self.bulk_insert(Category, categories) for c in batch]
+
+    def brand_name(self, i):
+        first, second = BRAND_PARTS
+        name = first[i % len(first)] + second[i // len(first) % len(second)]
+        repeat = i // (len(first) * len(second))
+        return f"{name} {repeat + 1}" if repeat else name
+
+    def create_brands(self, count):
+        brands = (
+            Brand(name=self.brand_name(i), website=f"https://brand{i}.{EMAIL_DOMAIN}") for i in range(count)
+        )
+        return [(b.pk, b.name) for batch in self.bulk_insert(Brand, brands) for b in batch]
+
+    def create_products(self, count, brands, categories):
+        rnd = self.rnd
+
+        def products():
+            for i in range(count):
+                brand_id, brand_name = rnd.choice(brands)
+                category_id, kind = rnd.choice(categories)
+                name = f"{brand_name} {rnd.choice(ADJECTIVES)} {rnd.choice(NOUNS[kind])} {rnd.randint(1, 999)}"
+                created_at = self.past()
+                yield Product(
+                    name=name,
+                    slug=f"{PREFIX}-product-{i}",
+                    brand_id=brand_id,
+                    category_id=category_id,
+                    # Most gear is cheap, a few items are very expensive.
+                    price=Decimal(min(999999, int(rnd.lognormvariate(8.3, 0.9)))) / 100,
+                    stock=rnd.choice((0, rnd.randint(1, 20), rnd.randint(20, 500))),
+                    short_description=f"{rnd.choice(ADJECTIVES)} {kind.lower()} by {brand_name}.",
+                    long_description="\r\n\r\n".join(
+                        " ".join(rnd.sample(SENTENCES, rnd.randint(2, 5))) for _ in range(rnd.randint(1, 4))
+                    ),
+                    is_active=rnd.random() > 0.03,
+                    created_at=created_at,
+                    updated_at=created_at,
+                )
+
+        # Only ids and prices (in cents) are kept for the order stage, in
+        # compact arrays: a few MB even for millions of products.
+        ids, cents = array("q"), array("q")
+        for batch in self.bulk_insert(Product, products()):
+            for product in batch:
+                ids.append(product.pk)
+                cents.append(int(product.price * 100))
+        return ids, cents
+
+    def create_users(self, count):
+        # One password hash for everyone: hashing per user would dominate.
+        password = make_password("loadtest-pass")
+        User = get_user_model()
+        users = (
+            User(username=f"{PREFIX}-user-{i}", email=f"user{i}@{EMAIL_DOMAIN}", password=password)
+            for i in range(count)
+        )
+        return array("q", (u.pk for batch in self.bulk_insert(User, users) for u in batch))
+
+    def create_orders(self, count, products, users, max_items, skew):
+        if count and not products[0]:
+            raise CommandError("Orders need products; pass --products.")
+        rnd = self.rnd
+        product_ids, cents = products
+
+        # Zipf-like popularity: rank r is picked with weight 1 / r**skew, and
+        # ranks are shuffled over products so popularity doesn't follow ids.
+        ranks = array("q", range(len(product_ids)))
+        rnd.shuffle(ranks)
+        cumulative = array("d")
+        total_weight = 0.0
+        for rank in range(1, len(product_ids) + 1):
+            total_weight += 1 / rank**skew
+            cumulative.append(total_weight)
+
+        def pick():
+            rank = bisect.bisect_left(cumulative, rnd.random() * total_weight)
+            return ranks[min(rank, len(ranks) - 1)]
+
+        created = 0
+        statuses = ["pending"] * 2 + ["paid"] * 3 + ["shipped"] * 3 + ["completed"] * 8 + ["cancelled"]
+        for start in range(0, count, self.batch_size):
+            orders, lines = [], []
+            for i in range(start, min(count, start + self.batch_size)):
+                first, last = rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES)
+                # Roughly a third of orders are guest checkouts.
+                user_id = rnd.choice(users) if users and rnd.random() > 0.33 else None
+                items, total = [], 0
+                for index in {pick() for _ in range(rnd.randint(1, max_items))}:
+                    quantity = rnd.choice((1, 1, 1, 2, 3))
+                    items.append((product_ids[index], quantity, cents[index]))
+                    total += quantity * cents[index]
+                created_at = self.past()
+                orders.append(
+                    Order(
+                        user_id=user_id,
+                        customer_name=f"{first} {last}",
+                        customer_email=f"order{i}@{EMAIL_DOMAIN}",
+                        status=rnd.choice(statuses),
+                        total_price=Decimal(total) / 100,
+                        created_at=created_at,
+                        updated_at=created_at,
+                    )
+                )
+                lines.append(items)
+
+            with transaction.atomic():
+                Order.objects.bulk_create(orders, batch_size=self.batch_size)
+                OrderItem.objects.bulk_create(
+                    (
+                        OrderItem(order_id=order.pk, product_id=product_id, quantity=quantity, unit_price=Decimal(price) / 100)
+                        for order, items in zip(orders, lines)
+                        for product_id, quantity, price in items
+                    ),
+                    batch_size=self.batch_size,
+                )
+            created += len(orders)
+        return created
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from store.cache import bump_catalog_version
+from store.documents import DOCUMENT_BATCH_SIZE, rebuild_documents
+
+
+class Command(BaseCommand):
+    help = "Re-render the ProductDocument read model (after bulk imports or enabling STORE_PRODUCT_DOCUMENTS)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=DOCUMENT_BATCH_SIZE, help="Products rendered per query."
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_documents(options["batch_size"])
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} product documents."))
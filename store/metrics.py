@@ -0,0 +1,196 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from .cache import cache_stats
+
+
+# Per-request timings and per-route histograms.
+#
+# backend.middleware.InstrumentationMiddleware opens a RequestTimings for
+# every request: SQL time and query count come from an execute wrapper that
+# every database connection gets when it opens (store/signals.py), views mark
+# their serialization with `measure("serialize")`. The
+# totals go out as a Server-Timing header and into the histograms below,
+# which `metrics_view` renders in the Prometheus text format. Histograms are
+# per process; with several gunicorn workers each one reports its own.
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+
+# Methods recorded under their own name; any other is "other", so clients
+# can't add series (or break the output) with made-up methods.
+METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+
+_current = ContextVar("store_request_timings", default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.stages = {"db": 0.0, "serialize": 0.0}
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def server_timing(self, total):
+        return ", ".join(
+            [
+                f'db;dur={self.stages["db"] * 1000:.1f};desc="{self.queries} queries"',
+                *(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages.items() if stage != "db"),
+                f"total;dur={total * 1000:.1f}",
+            ]
+        )
+
+
+def record_query(execute, sql, params, many, context):
+    # Connections are per thread; the request is found through the context,
+    # which sync_to_async carries over to the thread running async ORM calls.
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add("db", time.perf_counter() - start)
+        timings.queries += 1
+
+
+def instrument(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def track_request():
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def measure(stage):
+    """Add the time spent in the block to `stage` of the current request.
+
+    SQL run inside the block (lazy querysets evaluated by a serializer) is
+    left out; it is already counted under "db".
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start, db = time.perf_counter(), timings.stages["db"]
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start - (timings.stages["db"] - db)
+        timings.add(stage, max(elapsed, 0.0))
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+
+class Registry:
+    """Histograms and counters keyed by (route, method), safe across threads."""
+
+    histograms = {
+        "store_request_duration_seconds": ("Total time spent in the view and middleware.", DURATION_BUCKETS),
+        "store_request_db_seconds": ("Time spent executing SQL.", DURATION_BUCKETS),
+        "store_request_serialize_seconds": ("Time spent serializing response data.", DURATION_BUCKETS),
+        "store_request_db_queries": ("SQL queries per request.", QUERY_BUCKETS),
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.series = {name: {} for name in self.histograms}
+            self.responses = {}
+
+    def record(self, route, method, status, timings, total):
+        method = method if method in METHODS else "other"
+        labels = (route, method)
+        values = {
+            "store_request_duration_seconds": total,
+            "store_request_db_seconds": timings.stages["db"],
+            "store_request_serialize_seconds": timings.stages["serialize"],
+            "store_request_db_queries": timings.queries,
+        }
+        with self.lock:
+            for name, value in values.items():
+                series = self.series[name]
+                if labels not in series:
+                    series[labels] = Histogram(self.histograms[name][1])
+                series[labels].observe(value)
+            key = (route, method, str(status))
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, (help_text, buckets) in self.histograms.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for (route, method), histogram in sorted(self.series[name].items()):
+                    labels = f'route="{escape(route)}",method="{method}"'
+                    cumulative = 0
+                    for bound, count in zip((*buckets, "+Inf"), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f"{name}_sum{{{labels}}} {histogram.total:.6f}")
+                    lines.append(f"{name}_count{{{labels}}} {cumulative}")
+
+            lines += ["# HELP store_responses_total Responses by route and status.", "# TYPE store_responses_total counter"]
+            for (route, method, status), count in sorted(self.responses.items()):
+                lines.append(f'store_responses_total{{route="{escape(route)}",method="{method}",status="{status}"}} {count}')
+
+        lines += ["# HELP store_catalog_cache_total Catalog response cache lookups.", "# TYPE store_catalog_cache_total counter"]
+        for view, outcomes in sorted(cache_stats().items()):
+            for outcome, count in sorted(outcomes.items()):
+                lines.append(f'store_catalog_cache_total{{view="{view}",outcome="{outcome}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+def escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Registry()
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; requires STORE_METRICS_TOKEN as a bearer token.
+
+    Without a token it is only served with DEBUG on.
+    """
+    token = getattr(settings, "STORE_METRICS_TOKEN", "")
+    if token:
+        supplied = request.META.get("HTTP_AUTHORIZATION", "").removeprefix("Bearer ")
+        if not constant_time_compare(supplied, token):
+            return HttpResponseForbidden()
+    elif not settings.DEBUG:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,54 @@
+from django.db import migrations
+
+
+FTS_TABLE = "store_product_fts"
+GIN_INDEX = "store_product_search_gin"
+
+
+def search_vector():
+    # Frozen copy of store.search.product_search_vector(); the two must
+    # compile to the same SQL for Postgres to use the index.
+    from django.contrib.postgres.search import SearchVector
+
+    return (
+        SearchVector("name", weight="A", config="english")
+        + SearchVector("short_description", weight="B", config="english")
+        + SearchVector("long_description", weight="C", config="english")
+    )
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        from django.contrib.postgres.indexes import GinIndex
+
+        Product = apps.get_model("store", "Product")
+        schema_editor.add_index(Product, GinIndex(search_vector(), name=GIN_INDEX))
+    elif vendor == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            "USING fts5(name, short_description, long_description, tokenize='porter unicode61')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, short_description, long_description) "
+            "SELECT id, name, short_description, long_description FROM store_product"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {GIN_INDEX}")
+    elif vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0004_alter_product_image_file"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,76 @@
+import warnings
+
+from django.db import migrations
+
+
+# Trigram indexes for the order admin's search_fields. Admin search runs
+# `UPPER(column) LIKE UPPER('%term%')`, which a btree can't serve; a GIN
+# index over the same UPPER() expression with gin_trgm_ops can. Postgres
+# only: SQLite has no equivalent, and a development database doesn't need
+# one. Built CONCURRENTLY so checkout keeps writing orders meanwhile.
+#
+# The indexes need the pg_trgm extension. Creating it takes a superuser, or
+# CREATE on the database (pg_trgm is a trusted extension), which the app's
+# role often lacks on managed Postgres. Without either the indexes are
+# skipped with a warning: order search still works, only slower. To add
+# them later, have the database owner run `CREATE EXTENSION pg_trgm`, then
+# run the CREATE INDEX statements below by hand.
+
+INDEXES = {
+    "store_order_customer_name_trgm": "customer_name",
+    "store_order_customer_email_trgm": "customer_email",
+}
+
+
+def pg_trgm_status(connection):
+    """(installed, creatable by the current role) for the pg_trgm extension."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'),
+                   (SELECT rolsuper FROM pg_roles WHERE rolname = current_user)
+                   OR (has_database_privilege(current_database(), 'CREATE')
+                       AND COALESCE((SELECT trusted FROM pg_available_extension_versions v
+                                     JOIN pg_available_extensions e USING (name)
+                                     WHERE name = 'pg_trgm' AND v.version = e.default_version), false))
+            """
+        )
+        return cursor.fetchone()
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    installed, can_create = pg_trgm_status(schema_editor.connection)
+    if not (installed or can_create):
+        warnings.warn(
+            "Skipping the order search trigram indexes: the pg_trgm extension is not installed and this "
+            "database role can't create it. See store/migrations/0008_order_search_indexes.py."
+        )
+        return
+    if not installed:
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, column in INDEXES.items():
+        schema_editor.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} "
+            f"ON store_order USING gin (UPPER({column}::text) gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name in INDEXES:
+        schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("store", "0007_product_image_variants"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
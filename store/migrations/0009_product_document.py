@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0008_order_search_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductDocument",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("brand_id", models.BigIntegerField()),
+                ("category_id", models.BigIntegerField()),
+                ("price", models.DecimalField(decimal_places=2, max_digits=8)),
+                ("created_at", models.DateTimeField()),
+                ("updated_at", models.DateTimeField()),
+                ("body", models.TextField()),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["price", "id"], name="document_price_idx"),
+                    models.Index(fields=["created_at", "id"], name="document_created_idx"),
+                    models.Index(fields=["brand_id", "id"], name="document_brand_idx"),
+                    models.Index(fields=["category_id", "id"], name="document_category_idx"),
+                ],
+            },
+        ),
+    ]
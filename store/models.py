@@ -72,6 +72,15 @@ class Product(models.Model):
     image_file = models.ImageField(
         upload_to="products/", blank=True, null=True, validators=[validate_image_file]
     )
+    # Resized/re-encoded copies of image_file, maintained by store.images.
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination seeks for each allowed ordering (see store.pagination).
+            models.Index(fields=["is_active", "price", "id"], name="product_active_price_idx"),
+            models.Index(fields=["is_active", "created_at", "id"], name="product_active_created_idx"),
+        ]
 
     def get_image_url(self):
         if self.image_file:
@@ -82,9 +91,35 @@ class Product(models.Model):
 
     def __str__(self):
         return self.name
-    
 
-    
+
+class ProductDocument(models.Model):
+    """Read model of an active product: its rendered JSON plus filter columns.
+
+    Maintained by store.documents; not a foreign key to Product on purpose,
+    the table is only ever read and rewritten as a whole row.
+    """
+
+    id = models.BigIntegerField(primary_key=True)  # the product's id
+    brand_id = models.BigIntegerField()
+    category_id = models.BigIntegerField()
+    price = models.DecimalField(max_digits=8, decimal_places=2)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    body = models.TextField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["price", "id"], name="document_price_idx"),
+            models.Index(fields=["created_at", "id"], name="document_created_idx"),
+            models.Index(fields=["brand_id", "id"], name="document_brand_idx"),
+            models.Index(fields=["category_id", "id"], name="document_category_idx"),
+        ]
+
+    def __str__(self):
+        return f"Document of product {self.id}"
+
+
 
 class Order(models.Model):
     STATUS_CHOICES = [
@@ -112,6 +147,12 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="order_created_idx"),
+            models.Index(fields=["user", "created_at", "id"], name="order_user_created_idx"),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} - {self.status}"
 
@@ -0,0 +1,174 @@
+import base64
+import binascii
+import json
+from collections import namedtuple
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Page
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+Cursor = namedtuple("Cursor", ["value", "pk", "reverse"])
+
+
+def wants_cursor_pagination(request):
+    """Cursor mode is opt-in: `?pagination=cursor`, or any request carrying a cursor."""
+    params = request.query_params
+    return params.get("pagination") == "cursor" or KeysetPagination.cursor_query_param in params
+
+
+class KeysetPagination:
+    """Seek-based pagination over one ordering field with `id` as tiebreak.
+
+    Unlike PageNumberPagination it never runs COUNT(*) and never uses OFFSET:
+    every page is `WHERE (field, id) > (last_field, last_id) ... LIMIT n`,
+    which costs the same on page 1 and page 10,000 given an index on
+    (field, id). Cursors are opaque base64 tokens holding the boundary row.
+    """
+
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self, ordering="id", page_size=None):
+        self.descending = ordering.startswith("-")
+        self.field = ordering.lstrip("-")
+        self.page_size = page_size or api_settings.PAGE_SIZE
+
+    def order_by(self, descending):
+        prefix = "-" if descending else ""
+        fields = [self.field] if self.field == "id" else [self.field, "id"]
+        return [prefix + field for field in fields]
+
+    def seek_filter(self, cursor, descending):
+        op = "lt" if descending else "gt"
+        if self.field == "id":
+            return Q(**{f"id__{op}": cursor.pk})
+        return Q(**{f"{self.field}__{op}": cursor.value}) | Q(
+            **{self.field: cursor.value, f"id__{op}": cursor.pk}
+        )
+
+    def page_queryset(self, queryset, request):
+        """The query for the requested page, plus one row to detect more."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.model = queryset.model
+
+        self.cursor = cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor.reverse)
+        # Walking backwards runs the query in the opposite direction and
+        # flips the rows afterwards.
+        descending = self.descending != reverse
+
+        queryset = queryset.order_by(*self.order_by(descending))
+        if cursor is not None:
+            queryset = queryset.filter(self.seek_filter(cursor, descending))
+        return queryset[: self.page_size + 1]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        return self.set_page([row async for row in self.page_queryset(queryset, request)])
+
+    def set_page(self, rows):
+        cursor = self.cursor
+        reverse = bool(cursor and cursor.reverse)
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = cursor is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.link_for(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.link_for(self.page[0], reverse=True)
+
+    def link_for(self, row, reverse):
+        url = remove_query_param(self.base_url, "page")
+        url = replace_query_param(url, "pagination", "cursor")
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(row, reverse))
+
+    def encode_cursor(self, row, reverse):
+        # Rows are model instances, or dicts when paginating .values().
+        if isinstance(row, dict):
+            value, pk = row[self.field], row["id"]
+        else:
+            value, pk = getattr(row, self.field), row.pk
+        payload = {"v": value.isoformat() if hasattr(value, "isoformat") else str(value), "i": pk}
+        if reverse:
+            payload["r"] = 1
+        raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+            payload = json.loads(raw)
+            field = self.model._meta.get_field(self.field)
+            value = field.to_python(payload["v"])
+            pk = int(payload["i"])
+            reverse = bool(payload.get("r"))
+        except (binascii.Error, ValueError, TypeError, KeyError, AttributeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(value=value, pk=pk, reverse=reverse)
+
+
+class AsyncPageNumberPagination(PageNumberPagination):
+    """PageNumberPagination that counts and fetches with the async ORM.
+
+    Produces the same page objects (and so the same responses and links) as
+    the sync class; the count is taken with `acount()` and handed to the
+    Django paginator so it never queries on its own.
+    """
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(page_number=page_number, message=str(exc))
+            raise NotFound(msg)
+
+        bottom = (number - 1) * paginator.per_page
+        rows = [row async for row in queryset[bottom : bottom + paginator.per_page]]
+        self.page = Page(rows, number, paginator)
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return rows
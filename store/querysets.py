@@ -0,0 +1,56 @@
+from django.db.models import Prefetch
+
+from .models import Category, Brand, Product, Order, OrderItem
+
+
+# Shared queryset builders used by the views so that every endpoint loads its
+# relations up front. Each builder returns a queryset whose serialization costs
+# a fixed number of queries regardless of how many rows end up on the page.
+
+# Orderings product_list accepts; anything else is ignored.
+PRODUCT_ORDERINGS = ("price", "-price", "created_at", "-created_at")
+
+
+def category_queryset():
+    return Category.objects.all().order_by("id")
+
+
+def brand_queryset():
+    return Brand.objects.all().order_by("id")
+
+
+def product_queryset(active_only=True):
+    """Products with brand and category joined in the same query."""
+    products = Product.objects.select_related("brand", "category")
+    if active_only:
+        products = products.filter(is_active=True)
+    return products
+
+
+# Product columns the compact order line representation reads.
+ORDER_PRODUCT_FIELDS = ("id", "name", "slug", "main_image", "image_file")
+
+
+def order_item_queryset(expand=False):
+    if expand:
+        return OrderItem.objects.select_related(
+            "product", "product__brand", "product__category"
+        ).order_by("id")
+    return (
+        OrderItem.objects.select_related("product")
+        .only("id", "order_id", "quantity", "unit_price", *(f"product__{f}" for f in ORDER_PRODUCT_FIELDS))
+        .order_by("id")
+    )
+
+
+def order_queryset(expand=False):
+    """Orders with their items and products prefetched.
+
+    Serializing any number of orders costs two queries: one for the orders
+    and one for all of their items, with products (plus brands and categories
+    when `expand` is set) joined onto the item query. Without `expand` only
+    the product columns the compact representation needs are loaded.
+    """
+    return Order.objects.prefetch_related(
+        Prefetch("items", queryset=order_item_queryset(expand))
+    ).order_by("-created_at", "-id")
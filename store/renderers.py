@@ -0,0 +1,58 @@
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional, see requirements.txt
+    orjson = None
+
+
+# JSON rendering and parsing through orjson.
+#
+# FastJSONRenderer produces the same bytes as DRF's JSONRenderer with the
+# default settings (compact, unescaped UTF-8, U+2028/U+2029 escaped):
+# datetimes get the same ISO 8601 form with "Z" for UTC, and anything orjson
+# doesn't know (Decimal, lazy strings, querysets...) goes through DRF's
+# encoder as before. Both classes fall back to the stdlib when orjson isn't
+# installed, STORE_FAST_JSON is off, or the request asks for something only
+# the stdlib does (indented output, non-UTF-8 request bodies).
+
+OPTIONS = (orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+_default = JSONEncoder().default
+
+
+def fast_json_enabled():
+    return orjson is not None and getattr(settings, "STORE_FAST_JSON", True)
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            data is None
+            or not fast_json_enabled()
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        content = orjson.dumps(data, default=_default, option=OPTIONS)
+        if b"\xe2\x80\xa8" in content or b"\xe2\x80\xa9" in content:
+            content = content.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return content
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get("encoding", settings.DEFAULT_CHARSET)
+        if not fast_json_enabled() or encoding.lower().replace("-", "") != "utf8":
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
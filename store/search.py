@@ -0,0 +1,148 @@
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+
+# Pluggable product search.
+#
+# `product_list` hands its queryset and the raw `search` string to the
+# configured backend, which filters it and orders it by relevance (an explicit
+# `ordering` parameter still wins, because the view applies it afterwards).
+#
+# STORE_SEARCH_BACKEND selects the backend: "auto" (the default) picks the
+# full-text backend for the database in use, otherwise give a dotted path.
+
+SEARCH_CONFIG = "english"
+FTS_TABLE = "store_product_fts"
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class SearchBackend:
+    """Interface every search backend implements."""
+
+    def search(self, queryset, query):
+        raise NotImplementedError
+
+    def index(self, product):
+        """Bring the index entry for `product` up to date."""
+
+    def remove(self, product_id):
+        """Drop `product_id` from the index."""
+
+    def rebuild(self):
+        """Re-index every product (after bulk imports, which skip signals)."""
+
+
+class IcontainsSearchBackend(SearchBackend):
+    """Substring matching with no index; the original behaviour."""
+
+    def search(self, queryset, query):
+        return queryset.filter(
+            Q(name__icontains=query)
+            | Q(short_description__icontains=query)
+            | Q(long_description__icontains=query)
+        )
+
+
+def product_search_vector():
+    """Weighted tsvector over the searchable product columns.
+
+    Must stay identical to the expression indexed by migration 0005, or
+    Postgres won't use the GIN index.
+    """
+    from django.contrib.postgres.search import SearchVector
+
+    return (
+        SearchVector("name", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("short_description", weight="B", config=SEARCH_CONFIG)
+        + SearchVector("long_description", weight="C", config=SEARCH_CONFIG)
+    )
+
+
+class PostgresSearchBackend(SearchBackend):
+    """tsvector matching over a GIN expression index, ranked by ts_rank.
+
+    The index is on an expression of the row itself, so Postgres keeps it in
+    sync on every write and index()/remove()/rebuild() have nothing to do.
+    """
+
+    def search(self, queryset, query):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type="websearch")
+        vector = product_search_vector()
+        return (
+            queryset.annotate(search_vector=vector)
+            .filter(search_vector=search_query)
+            .annotate(search_rank=SearchRank(vector, search_query))
+            .order_by("-search_rank", "id")
+        )
+
+
+class SQLiteFTSSearchBackend(SearchBackend):
+    """SQLite FTS5 table ranked by bm25, kept in sync from Product signals."""
+
+    def match_expression(self, query):
+        # Quote every word so user input can't inject FTS5 syntax, and
+        # prefix-match it so partial words still hit, like icontains did.
+        words = WORD_RE.findall(query)
+        return " ".join(f'"{word}"*' for word in words)
+
+    def search(self, queryset, query):
+        match = self.match_expression(query)
+        if not match:
+            return queryset.none()
+        table = queryset.model._meta.db_table
+        # A plain join lets SQLite drive the query from the FTS index and
+        # compute bm25() once per match; bm25() is lower-is-better and the
+        # weights put name matches above description matches.
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f"{FTS_TABLE}.rowid = {table}.id", f"{FTS_TABLE} MATCH %s"],
+            params=[match],
+            select={"search_rank": f"bm25({FTS_TABLE}, 10.0, 5.0, 1.0)"},
+            order_by=["search_rank", "id"],
+        )
+
+    def index(self, product):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product.pk])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, short_description, long_description) VALUES (%s, %s, %s, %s)",
+                [product.pk, product.name, product.short_description, product.long_description],
+            )
+
+    def remove(self, product_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, short_description, long_description) "
+                "SELECT id, name, short_description, long_description FROM store_product"
+            )
+
+
+AUTO_BACKENDS = {
+    "postgresql": PostgresSearchBackend,
+    "sqlite": SQLiteFTSSearchBackend,
+}
+
+
+@lru_cache(maxsize=None)
+def _load_backend(path, vendor):
+    if path == "auto":
+        return AUTO_BACKENDS.get(vendor, IcontainsSearchBackend)()
+    return import_string(path)()
+
+
+def get_search_backend():
+    path = getattr(settings, "STORE_SEARCH_BACKEND", "auto")
+    return _load_backend(path, connection.vendor)
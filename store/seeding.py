@@ -0,0 +1,94 @@
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+
+from .cache import bump_catalog_version
+from .models import Brand, Category, Order, OrderItem, Product
+from .search import get_search_backend
+
+
+# Seeded catalogs for the performance tests (store/tests.py) and the
+# benchmark scripts (scripts/bench_*.py). For production-sized synthetic
+# data use the generate_catalog command instead.
+
+# Orders seeded per catalog size: one order for every 20 products, capped so
+# that the largest catalogs still carry "thousands" of orders.
+ORDERS_PER_PRODUCT = 20
+MAX_ORDERS = 5000
+ITEMS_PER_ORDER = 3
+
+User = get_user_model()
+
+
+def seed_catalog(size, seed=1234):
+    """Top up the catalog to `size` products, with orders proportional to it.
+
+    Uses bulk_create so that even 100k products seed in seconds. Calling it
+    again with a larger size only inserts the missing rows.
+    """
+    rnd = random.Random(seed + size)
+
+    categories = list(Category.objects.all())
+    if not categories:
+        categories = Category.objects.bulk_create(
+            Category(name=f"Category {i}", slug=f"category-{i}") for i in range(12)
+        )
+    brands = list(Brand.objects.all())
+    if not brands:
+        brands = Brand.objects.bulk_create(
+            Brand(name=f"Brand {i}", website=f"https://brand{i}.example.com")
+            for i in range(25)
+        )
+
+    existing = Product.objects.count()
+    Product.objects.bulk_create(
+        (
+            Product(
+                name=f"Product {i}",
+                slug=f"product-{i}",
+                brand=rnd.choice(brands),
+                category=rnd.choice(categories),
+                price=Decimal(rnd.randint(500, 99999)) / 100,
+                stock=rnd.randint(0, 500),
+                short_description=f"Short description for product {i}",
+                long_description=" ".join(["Long description text."] * 40),
+                is_active=rnd.random() > 0.05,
+            )
+            for i in range(existing, size)
+        ),
+        batch_size=2000,
+    )
+
+    user, _ = User.objects.get_or_create(username="perf-user", defaults={"email": "perf@example.com"})
+    target_orders = min(MAX_ORDERS, max(10, size // ORDERS_PER_PRODUCT))
+    missing_orders = target_orders - Order.objects.count()
+    if missing_orders > 0:
+        product_ids = list(Product.objects.values_list("id", flat=True)[:5000])
+        orders = Order.objects.bulk_create(
+            Order(
+                user=user if i % 2 == 0 else None,
+                customer_name=f"Customer {i}",
+                customer_email=f"customer{i}@example.com",
+                total_price=Decimal("0.00"),
+            )
+            for i in range(missing_orders)
+        )
+        OrderItem.objects.bulk_create(
+            (
+                OrderItem(
+                    order=order,
+                    product_id=rnd.choice(product_ids),
+                    quantity=rnd.randint(1, 3),
+                    unit_price=Decimal("19.99"),
+                )
+                for order in orders
+                for _ in range(ITEMS_PER_ORDER)
+            ),
+            batch_size=2000,
+        )
+    # bulk_create bypasses the signals that invalidate cached catalog pages
+    # and keep the search index in sync.
+    get_search_backend().rebuild()
+    bump_catalog_version()
+    return user
@@ -1,5 +1,7 @@
 from rest_framework import serializers
 from .models import Category, Brand, Product, Order, OrderItem
+from .hashing import hash_password
+from .images import srcset
 from django.contrib.auth import get_user_model
 
 
@@ -19,10 +21,32 @@ class BrandSerializer(serializers.ModelSerializer):
         fields = ["id", "name", "website"]
 
 
-class ProductListSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """Honours the `fields` and `expand` context of store.rows.sparse_fieldset.
+
+    `fields` keeps only the named top-level fields; `expand` lists the
+    relations that stay nested, any others are rendered as their ids.
+    Without either in the context the serializer is unchanged.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        only = self.context.get("fields")
+        if only:
+            fields = {name: field for name, field in fields.items() if name in only}
+        expand = self.context.get("expand")
+        if expand is not None:
+            for name in ("brand", "category"):
+                if name in fields and name not in expand:
+                    fields[name] = serializers.PrimaryKeyRelatedField(read_only=True)
+        return fields
+
+
+class ProductListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     brand = BrandSerializer()
     category = CategorySerializer()
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
@@ -36,6 +60,7 @@ class ProductListSerializer(serializers.ModelSerializer):
             "stock",
             "main_image",
             "image",
+            "image_srcset",
             "short_description",
             "long_description",
             "is_active",
@@ -52,34 +77,27 @@ class ProductListSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(url)
         return url
 
+    def get_image_srcset(self, obj):
+        request = self.context.get("request")
+        return srcset(obj.image_variants, request.build_absolute_uri if request else str)
+
+
+class ProductDetailSerializer(ProductListSerializer):
+    """Same representation as list rows; list pages are built by store.rows."""
+
+
+class OrderProductSerializer(serializers.ModelSerializer):
+    """The few product fields an order line needs to render."""
 
-class ProductDetailSerializer(serializers.ModelSerializer):
-    brand = BrandSerializer()
-    category = CategorySerializer()
     image = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
-        fields = [
-            "id",
-            "name",
-            "slug",
-            "brand",
-            "category",
-            "price",
-            "stock",
-            "main_image",
-            "image",
-            "short_description",
-            "long_description",
-            "is_active",
-            "created_at",
-            "updated_at",
-        ]
+        fields = ["id", "name", "slug", "image"]
 
     def get_image(self, obj):
         request = self.context.get("request")
-        url = obj.get_image_url() if hasattr(obj, "get_image_url") else (getattr(obj, "main_image", "") or "")
+        url = obj.get_image_url()
         if not url:
             return ""
         if request:
@@ -88,6 +106,14 @@ class ProductDetailSerializer(serializers.ModelSerializer):
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
+    product = OrderProductSerializer()
+
+    class Meta:
+        model = OrderItem
+        fields = ["id", "product", "quantity", "unit_price"]
+
+
+class OrderItemExpandedSerializer(serializers.ModelSerializer):
     product = ProductListSerializer()
 
     class Meta:
@@ -111,6 +137,12 @@ class OrderSerializer(serializers.ModelSerializer):
         ]
 
 
+class OrderExpandedSerializer(OrderSerializer):
+    """Orders with the full product (brand, category, descriptions) per item."""
+
+    items = OrderItemExpandedSerializer(many=True)
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -125,9 +157,11 @@ class RegisterSerializer(serializers.ModelSerializer):
         fields = ["id", "username", "email", "password"]
 
     def create(self, validated_data):
-        user = User.objects.create_user(
-            username=validated_data["username"],
-            email=validated_data.get("email", ""),
-            password=validated_data["password"],
+        # What create_user does, with the hash computed in the hashing pool.
+        user = User(
+            username=User.normalize_username(validated_data["username"]),
+            email=User.objects.normalize_email(validated_data.get("email", "")),
+            password=hash_password(validated_data["password"]),
         )
+        user.save()
         return user
@@ -0,0 +1,110 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .authentication import user_cache
+from .cache import CATALOG, TAXONOMY, bump_catalog_version
+from .documents import refresh_documents
+from .events import EVENT_FIELDS, product_event, publish
+from .models import Category, Brand, Product
+from .images import delete_variants, schedule_variants
+from .metrics import instrument
+from .search import get_search_backend
+
+# Saves that only touch these fields don't change any searchable text.
+UNSEARCHABLE_FIELDS = {"stock", "price", "is_active", "updated_at"}
+
+
+def invalidate_catalog(scopes=(CATALOG,)):
+    # Bump now so this process stops serving the old payloads immediately, and
+    # again once the transaction commits so a request that cached a pre-commit
+    # snapshot in between doesn't keep it alive.
+    def bump():
+        for scope in scopes:
+            bump_catalog_version(scope)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, **kwargs):
+    invalidate_catalog()
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def taxonomy_changed(sender, **kwargs):
+    invalidate_catalog((CATALOG, TAXONOMY))
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= UNSEARCHABLE_FIELDS:
+        return
+    get_search_backend().index(instance)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    get_search_backend().remove(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+def build_image_variants(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    source = instance.image_file.name if instance.image_file else ""
+    if source == instance.image_variants.get("source", ""):
+        return
+    if source:
+        # The old variants are deleted once the new manifest is saved.
+        schedule_variants(instance)
+    else:
+        Product.objects.filter(pk=instance.pk).update(image_variants={})
+        delete_variants(instance.image_variants)
+
+
+# After build_image_variants, which may still change the row.
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def refresh_product_document(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_documents([instance.pk])
+
+
+@receiver(post_save, sender=Product)
+def publish_product_event(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields and not set(update_fields) & set(EVENT_FIELDS)):
+        return
+    publish([product_event(instance.pk, instance.stock, instance.price, instance.is_active)])
+
+
+@receiver(post_delete, sender=Product)
+def publish_product_removed(sender, instance, **kwargs):
+    publish([{"id": instance.pk, "is_active": False}])
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=Category)
+def refresh_taxonomy_documents(sender, instance, raw=False, **kwargs):
+    # Brand and category are nested into every product's document. Deletes
+    # cascade to the products, whose own signal drops their documents.
+    if not raw:
+        refresh_documents(instance.products.values_list("id", flat=True))
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    instrument(connection)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def user_changed(sender, instance, **kwargs):
+    user_cache.discard(instance.pk)
@@ -0,0 +1,134 @@
+import asyncio
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import QueryDict
+
+from .events import event_ids, format_events, get_event_backend, product_snapshot, retry_field
+from .renderers import FastJSONRenderer
+
+
+# The open-ended event stream at /api/products/events/, as a bare ASGI app.
+#
+# backend/asgi.py routes the path here ahead of Django. A stream that went
+# through Django's ASGI handler would keep a thread alive for as long as it
+# is open (every request gets its own thread-sensitive executor, used by the
+# sync middleware hooks), so thousands of open streams would mean thousands
+# of idle threads. Here an idle stream is a coroutine, a task watching for
+# the disconnect and a Subscription. The price is skipping the middleware:
+# CORS is answered from the django-cors-headers settings, and there is
+# nothing else to apply to a public, read-only stream.
+#
+# A stream starts with the subscribed products' current values, then sends
+# their changes as they are published, a comment every
+# STORE_EVENT_STREAM_HEARTBEAT seconds so proxies don't drop it, and ends
+# after STORE_EVENT_STREAM_MAX_AGE seconds; EventSource reconnects on its own,
+# which spreads streams over restarted and newly added workers.
+
+EVENT_STREAM_PATH = "/api/products/events/"
+HEARTBEAT = b": keepalive\n\n"
+
+
+def header(scope, name):
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def cors_headers(scope):
+    origin = header(scope, b"origin")
+    if not origin:
+        return []
+    allowed = (
+        getattr(settings, "CORS_ALLOW_ALL_ORIGINS", False)
+        or origin in getattr(settings, "CORS_ALLOWED_ORIGINS", ())
+        or any(re.match(pattern, origin) for pattern in getattr(settings, "CORS_ALLOWED_ORIGIN_REGEXES", ()))
+    )
+    if not allowed:
+        return []
+    headers = [(b"access-control-allow-origin", origin.encode("latin-1")), (b"vary", b"Origin")]
+    if getattr(settings, "CORS_ALLOW_CREDENTIALS", False):
+        headers.append((b"access-control-allow-credentials", b"true"))
+    return headers
+
+
+def snapshot(product_ids):
+    # Outside Django's request cycle: manage the connection the way
+    # request_started/request_finished would.
+    close_old_connections()
+    try:
+        return product_snapshot(product_ids)
+    finally:
+        close_old_connections()
+
+
+async def respond(send, status, data, headers=()):
+    body = FastJSONRenderer().render(data)
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *headers]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def watch_disconnect(receive, subscription):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+    subscription.close()
+
+
+async def product_event_stream(scope, receive, send):
+    if scope["method"] not in ("GET", "HEAD"):
+        await respond(send, 405, {"detail": f"Method \"{scope['method']}\" not allowed."}, [(b"allow", b"GET, HEAD")])
+        return
+    try:
+        product_ids = event_ids(QueryDict(scope["query_string"].decode("latin-1")))
+    except ValueError as exc:
+        await respond(send, 400, {"detail": str(exc)}, cors_headers(scope))
+        return
+
+    backend = get_event_backend()
+    # Subscribed before the snapshot is read, so no change falls in between.
+    subscription = backend.subscribe(product_ids)
+    watcher = asyncio.ensure_future(watch_disconnect(receive, subscription))
+    try:
+        events = await sync_to_async(snapshot)(product_ids)
+        headers = [
+            (b"content-type", b"text/event-stream"),
+            (b"cache-control", b"no-cache"),
+            # Tells nginx not to buffer the stream.
+            (b"x-accel-buffering", b"no"),
+            *cors_headers(scope),
+        ]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        if scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            return
+        await send({"type": "http.response.body", "body": retry_field() + format_events(events), "more_body": True})
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + getattr(settings, "STORE_EVENT_STREAM_MAX_AGE", 600)
+        heartbeat = getattr(settings, "STORE_EVENT_STREAM_HEARTBEAT", 15)
+        while (remaining := deadline - loop.time()) > 0:
+            events = await subscription.next(min(heartbeat, remaining))
+            if events is None:
+                return
+            await send({"type": "http.response.body", "body": format_events(events) or HEARTBEAT, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        watcher.cancel()
+        backend.unsubscribe(subscription)
+
+
+class EventStreamRouter:
+    """ASGI app sending EVENT_STREAM_PATH to the event stream, the rest to `application`."""
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == EVENT_STREAM_PATH:
+            await product_event_stream(scope, receive, send)
+        else:
+            await self.application(scope, receive, send)
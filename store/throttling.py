@@ -0,0 +1,19 @@
+from django.conf import settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class AuthRateThrottle(SimpleRateThrottle):
+    """Per-IP limit on the endpoints that hash passwords (STORE_AUTH_THROTTLE_RATE).
+
+    Keyed on the client address even for authenticated users, so one client
+    can't keep the hashing pool busy. Behind a proxy, DRF's NUM_PROXIES
+    decides which X-Forwarded-For entry counts as the address.
+    """
+
+    scope = "auth"
+
+    def get_rate(self):
+        return getattr(settings, "STORE_AUTH_THROTTLE_RATE", "20/min")
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {"scope": self.scope, "ident": self.get_ident(request)}
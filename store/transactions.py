@@ -0,0 +1,32 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+@contextmanager
+def locking_atomic(using=DEFAULT_DB_ALIAS):
+    """transaction.atomic() for blocks that read rows with select_for_update().
+
+    SQLite ignores FOR UPDATE: two such transactions both read, then the
+    second one to write fails at once with "database is locked". On SQLite
+    the outermost block therefore starts with BEGIN IMMEDIATE, taking the
+    write lock up front so concurrent callers wait for it (up to the busy
+    timeout) instead. Other transactions keep SQLite's default DEFERRED
+    mode, so reads don't queue behind writers. Other databases get a plain
+    atomic block.
+    """
+    connection = connections[using]
+    if connection.vendor != "sqlite" or connection.in_atomic_block:
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    # The mode is read from the settings when the connection opens.
+    connection.ensure_connection()
+    mode, connection.transaction_mode = connection.transaction_mode, "IMMEDIATE"
+    try:
+        with transaction.atomic(using=using):
+            connection.transaction_mode = mode
+            yield
+    finally:
+        connection.transaction_mode = mode
@@ -1,6 +1,7 @@
+from django.conf import settings
 from django.urls import path
-from . import views
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from . import async_views, views
+from rest_framework_simplejwt.views import TokenRefreshView
 from django.http import JsonResponse
 
 
@@ -9,6 +10,9 @@ def api_root(request):
         "products": "/api/products/",
         "categories": "/api/categories/",
         "brands": "/api/brands/",
+        "facets": "/api/products/facets/",
+        "batch": "/api/products/batch/",
+        "events": "/api/products/events/",
         "auth": {
             "register": "/api/auth/register/",
             "login": "/api/auth/login/",
@@ -18,24 +22,31 @@ def api_root(request):
     })
 
 
+# Under ASGI the read-only catalog endpoints are served by async views.
+catalog = async_views if settings.STORE_ASYNC_CATALOG else views
 
 urlpatterns = [
 
     path("", api_root),
     #Products, Categories and Brands
-    path("categories/", views.category_list, name="category-list"),
-    path("brands/", views.brand_list, name="brand-list"),
-    path("products/", views.product_list, name="product-list"),
-    path("products/<slug:slug>/", views.product_detail, name="product-detail"),
+    path("categories/", catalog.category_list, name="category-list"),
+    path("brands/", catalog.brand_list, name="brand-list"),
+    path("products/", catalog.product_list, name="product-list"),
+    path("products/facets/", views.product_facets, name="product-facets"),
+    path("products/export/", views.product_export, name="product-export"),
+    path("products/batch/", views.product_batch, name="product-batch"),
+    path("products/events/", views.product_events, name="product-events"),
+    path("products/<slug:slug>/", catalog.product_detail, name="product-detail"),
 
     #Orders
      path("orders/", views.order_list_create, name="order-list-create"),
      path("orders/my/", views.my_orders, name="my-orders"),
+     path("orders/export/", views.order_export, name="order-export"),
 
     #Path
     path("auth/register/", views.register, name="register"),
     path("auth/me/", views.me, name="me"),
-    path("auth/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
+    path("auth/token/", views.TokenObtainView.as_view(), name="token_obtain_pair"),
     path("auth/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
 ]
 
@@ -1,47 +1,138 @@
 from decimal import Decimal
 from django.db import transaction
-from django.db.models import Q
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
 
-from rest_framework.decorators import api_view, permission_classes
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_safe
+
+from rest_framework.decorators import api_view, permission_classes, renderer_classes, throttle_classes
 from rest_framework.response import Response
 from rest_framework import status
-
-from .models import Category, Brand, Product, Order, OrderItem
+from rest_framework_simplejwt.views import TokenObtainPairView
+
+from .models import Product, ProductDocument, Order, OrderItem
+from .querysets import (
+    PRODUCT_ORDERINGS,
+    category_queryset,
+    brand_queryset,
+    product_queryset,
+    order_queryset,
+)
+from .authentication import db_user
+from .cache import (
+    cached_catalog_response,
+    bump_catalog_version,
+    cache_timeout,
+    catalog_version,
+    get_cache,
+    product_cache_key,
+    record,
+)
+from .conditional import cache_policy, conditional_catalog_list, conditional_product_detail, product_stamp
+from .documents import (
+    document_data,
+    document_detail_content,
+    document_rows,
+    filtered_documents,
+    refresh_documents,
+    serves_documents,
+)
+from .events import event_ids, format_events, product_snapshot, publish, retry_field
+from .exports import CSVRenderer, NDJSONRenderer, export_orders, export_products, parse_range
+from .facets import facet_counts
+from .inventory import OutOfStock, get_inventory_backend
+from .metrics import measure
+from .search import get_search_backend
+from .pagination import KeysetPagination, wants_cursor_pagination
+from .rows import ProductRows, parse_ids, parse_list_param, sparse_context, sparse_fieldset
+from .throttling import AuthRateThrottle
+from .transactions import locking_atomic
 from .serializers import (
     CategorySerializer,
     BrandSerializer,
-    ProductListSerializer,
     ProductDetailSerializer,
     OrderSerializer,
+    OrderExpandedSerializer,
     UserSerializer,
     RegisterSerializer,
 )
 
 from django.contrib.auth import get_user_model
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
 
 
 User = get_user_model()
 
 
+@cache_policy("category_list")
+@conditional_catalog_list("category_list")
 @api_view(["GET"])
+@cached_catalog_response("category_list")
 def category_list(request):
-    categories = Category.objects.all()
-    serializer = CategorySerializer(categories, many=True)
-    return Response(serializer.data)
+    categories = category_queryset()
+    with measure("serialize"):
+        data = CategorySerializer(categories, many=True).data
+    return Response(data)
 
 
+@cache_policy("brand_list")
+@conditional_catalog_list("brand_list")
 @api_view(["GET"])
+@cached_catalog_response("brand_list")
 def brand_list(request):
-    brands = Brand.objects.all()
-    serializer = BrandSerializer(brands, many=True)
-    return Response(serializer.data)
+    brands = brand_queryset()
+    with measure("serialize"):
+        data = BrandSerializer(brands, many=True).data
+    return Response(data)
 
 
+@cache_policy("product_list")
+@conditional_catalog_list("product_list")
 @api_view(["GET"])
+@cached_catalog_response("product_list")
 def product_list(request):
-    products = Product.objects.filter(is_active=True)
+    documents = filtered_documents(request) if serves_documents(request) else None
+    if documents is not None:
+        return document_list(request, documents)
+
+    rows = ProductRows(request, *sparse_fieldset(request))
+    paginator = product_paginator(request)
+    products = rows.values(filtered_products(request), paginator)
+    page = paginator.paginate_queryset(products, request)
+
+    if page is not None:
+        with measure("serialize"):
+            data = rows.data(page)
+        return paginator.get_paginated_response(data)
+
+    # Fallback (in case pagination is disabled)
+    with measure("serialize"):
+        data = rows.data(products)
+    return Response(data)
+
+
+def document_list(request, documents):
+    """product_list from the document table (see store.documents)."""
+    paginator = product_paginator(request)
+    rows = document_rows(documents)
+    page = paginator.paginate_queryset(rows, request)
+
+    if page is not None:
+        with measure("serialize"):
+            data = document_data(request, [row["body"] for row in page])
+        return paginator.get_paginated_response(data)
+
+    with measure("serialize"):
+        data = document_data(request, [row["body"] for row in rows])
+    return Response(data)
+
+
+def filtered_products(request):
+    """Active products filtered, searched and ordered per the query string."""
+    products = product_queryset()
 
     # Read query parameters
     category_id = request.query_params.get("category")
@@ -56,46 +147,198 @@ def product_list(request):
         products = products.filter(brand_id=brand_id)
 
     if search:
-        products = products.filter(
-            Q(name__icontains=search)
-            | Q(short_description__icontains=search)
-            | Q(long_description__icontains=search)
-        )
+        # Filtered and ordered by relevance; an explicit ordering overrides it.
+        products = get_search_backend().search(products, search)
 
     # Only allow safe ordering fields
-    if ordering in ["price", "-price", "created_at", "-created_at"]:
-        products = products.order_by(ordering)
+    if ordering in PRODUCT_ORDERINGS:
+        # id breaks ties, so pages over equal prices don't overlap.
+        products = products.order_by(ordering, "id")
+    return products
 
-    # Pagination
-    paginator = PageNumberPagination()
-    page = paginator.paginate_queryset(products, request)
 
-    if page is not None:
-        serializer = ProductListSerializer(page, many=True, context={"request": request})
-        return paginator.get_paginated_response(serializer.data)
+def product_paginator(request, page_number_class=PageNumberPagination):
+    """Page numbers by default, keyset cursors on request.
 
-    # Fallback (in case pagination is disabled)
-    serializer = ProductListSerializer(products, many=True, context={"request": request})
-    return Response(serializer.data)
+    Searches always get page numbers: keyset ordering would replace the
+    relevance ordering the search backend applies.
+    """
+    if wants_cursor_pagination(request) and not request.query_params.get("search"):
+        ordering = request.query_params.get("ordering")
+        return KeysetPagination(ordering if ordering in PRODUCT_ORDERINGS else "id")
+    return page_number_class()
 
 
+@cache_policy("product_facets")
+@conditional_catalog_list("product_facets")
+@api_view(["GET"])
+@cached_catalog_response("product_facets")
+def product_facets(request):
+    """Sidebar counts for the current search and brand/category filters."""
+    products = product_queryset()
+    search = request.query_params.get("search")
+    if search:
+        products = get_search_backend().search(products, search)
+    counts = facet_counts(
+        products,
+        brand=request.query_params.get("brand"),
+        category=request.query_params.get("category"),
+    )
+    return Response(counts)
+
+
+@cache_policy("product_batch")
+@conditional_catalog_list("product_batch")
+@api_view(["GET"])
+def product_batch(request):
+    """Active products by ?ids= and ?slugs= (comma-separated), for hydrating carts.
+
+    Results come in the order asked for, each product once; keys that don't
+    match an active product are listed under `missing`.
+    """
+    try:
+        keys = batch_keys(request)
+    except ValueError as exc:
+        return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    rows = batch_product_rows(request, keys)
+    results, seen = [], set()
+    missing = {"ids": [], "slugs": []}
+    for key in keys:
+        row = rows.get(key)
+        if row is None:
+            missing[f"{key[0]}s"].append(key[1])
+        elif row["id"] not in seen:
+            seen.add(row["id"])
+            results.append(row)
+    return Response({"results": results, "missing": missing})
+
+
+def batch_keys(request):
+    """[("id", 3), ("slug", "x"), ...] from the query string, deduplicated."""
+    ids = parse_list_param(request, "ids") or []
+    slugs = parse_list_param(request, "slugs") or []
+    if not ids and not slugs:
+        raise ValueError("Pass product ids and/or slugs, e.g. ?ids=1,2&slugs=some-product.")
+    limit = getattr(settings, "STORE_PRODUCT_BATCH_MAX", 50)
+    if len(ids) + len(slugs) > limit:
+        raise ValueError(f"At most {limit} ids and slugs per request.")
+    keys = [("id", value) for value in parse_ids(ids)] + [("slug", value) for value in slugs]
+    return list(dict.fromkeys(keys))
+
+
+def batch_product_rows(request, keys):
+    """{key: product row} for the keys that match, cached per product.
+
+    Each row is cached under its id and its slug with the catalog version in
+    the key, so a cart shares entries with every other cart holding the same
+    products. The misses are loaded in one query.
+    """
+    cache = get_cache()
+    version = catalog_version()
+    cache_keys = {key: product_cache_key(request, *key, version) for key in keys}
+    cached = cache.get_many(cache_keys.values())
+    rows = {key: cached[cache_key] for key, cache_key in cache_keys.items() if cache_key in cached}
+    misses = [key for key in keys if key not in rows]
+    record("product_batch", "hits", len(rows))
+    record("product_batch", "misses", len(misses))
+    if not misses:
+        return rows
+
+    ids = [value for field, value in misses if field == "id"]
+    slugs = [value for field, value in misses if field == "slug"]
+    product_rows = ProductRows(request)
+    products = product_rows.values(product_queryset().filter(Q(id__in=ids) | Q(slug__in=slugs)))
+    with measure("serialize"):
+        fetched = product_rows.data(products)
+    found = {}
+    for row in fetched:
+        found[("id", row["id"])] = row
+        found[("slug", row["slug"])] = row
+    cache.set_many(
+        {product_cache_key(request, *key, version): row for key, row in found.items()}, cache_timeout()
+    )
+    rows.update((key, found[key]) for key in misses if key in found)
+    return rows
+
+
+@cache_policy("product_detail")
+@conditional_product_detail
 @api_view(["GET"])
 def product_detail(request, slug):
+    if serves_documents(request):
+        response = document_detail(request, slug)
+        if response is not None:
+            return response
+
     try:
-        product = Product.objects.get(slug=slug, is_active=True)
+        product = product_queryset().get(slug=slug)
     except Product.DoesNotExist:
         return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
 
-    serializer = ProductDetailSerializer(product, context={"request": request})
-    return Response(serializer.data)
+    serializer = ProductDetailSerializer(product, context=sparse_context(request))
+    with measure("serialize"):
+        data = serializer.data
+    return Response(data)
+
+
+def document_detail(request, slug):
+    """product_detail from the document table; None if there is no document yet."""
+    stamp = product_stamp(request, slug)
+    body = stamp and ProductDocument.objects.filter(id=stamp[0]).values_list("body", flat=True).first()
+    if not body:
+        return None
+    if request.accepted_media_type == "application/json":
+        # Already rendered: send the bytes without parsing them again.
+        return HttpResponse(document_detail_content(request, body), content_type="application/json")
+    return Response(document_data(request, [body])[0])
+
+
+@require_safe
+def product_events(request):
+    """Current stock, price and is_active of `?ids=`, as server-sent events.
+
+    Under ASGI this path never gets here: backend/asgi.py sends it to the
+    open-ended stream in store/streams.py. Without ASGI the response ends
+    after the snapshot, and its `retry` field makes EventSource poll every
+    STORE_EVENT_STREAM_RETRY seconds with the same client code.
+    """
+    try:
+        product_ids = event_ids(request.GET)
+    except ValueError as exc:
+        return JsonResponse({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    content = retry_field() + format_events(product_snapshot(product_ids))
+    response = HttpResponse(content, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+def wants_expanded_orders(request):
+    """`?expand=product` returns full product objects on every order line."""
+    return "product" in request.query_params.get("expand", "").split(",")
+
+
+def order_serializer_class(request):
+    return OrderExpandedSerializer if wants_expanded_orders(request) else OrderSerializer
+
+
+def paginated_orders(request, **filters):
+    orders = order_queryset(expand=wants_expanded_orders(request)).filter(**filters)
+    if wants_cursor_pagination(request):
+        paginator = KeysetPagination("-created_at")
+    else:
+        paginator = PageNumberPagination()
+    page = paginator.paginate_queryset(orders, request)
+    serializer = order_serializer_class(request)(page, many=True, context={"request": request})
+    with measure("serialize"):
+        data = serializer.data
+    return paginator.get_paginated_response(data)
 
 
 @api_view(["GET", "POST"])
 def order_list_create(request):
     if request.method == "GET":
-        orders = Order.objects.all().order_by("-created_at")
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        return paginated_orders(request)
 
     # POST: create new order
     data = request.data
@@ -110,69 +353,160 @@ def order_list_create(request):
     customer_name = data.get("customer_name", "")
     customer_email = data.get("customer_email", "")
 
-    with transaction.atomic():
-        user = request.user if request.user.is_authenticated else None
-
-        order = Order.objects.create(
-            user=user,
-            customer_name=customer_name,
-            customer_email=customer_email,
-            status="pending",
-            total_price=0,
-        )
-
+    lines = []
+    for item in items_data:
+        try:
+            product_id = int(item.get("product_id") or 0)
+            quantity = int(item.get("quantity", 0))
+        except (AttributeError, TypeError, ValueError):
+            product_id = quantity = 0
+
+        if not product_id or quantity <= 0:
+            return Response(
+                {"detail": "Invalid item data."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        lines.append((product_id, quantity))
+
+    user = db_user(request.user) if request.user.is_authenticated else None
+    inventory = get_inventory_backend()
+    if inventory is not None:
+        return reserved_checkout(request, inventory, user, lines, customer_name, customer_email)
+
+    with locking_atomic():
+        # Lock every product in the order with one query, always in id order,
+        # so that concurrent checkouts over overlapping carts can't deadlock.
+        product_ids = sorted({product_id for product_id, _ in lines})
+        products = {
+            product.id: product
+            for product in Product.objects.select_for_update()
+            .filter(id__in=product_ids, is_active=True)
+            .order_by("id")
+        }
+
+        requested = {}
         total = Decimal("0.00")
+        order_items = []
 
-        for item in items_data:
-            product_id = item.get("product_id")
-            quantity = item.get("quantity", 0)
-
-            if not product_id or quantity <= 0:
+        for product_id, quantity in lines:
+            product = products.get(product_id)
+            if product is None:
                 transaction.set_rollback(True)
                 return Response(
-                    {"detail": "Invalid item data."},
+                    {"detail": f"Product with id {product_id} not found."},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            try:
-                product = Product.objects.get(id=product_id, is_active=True)
-            except Product.DoesNotExist:
+            requested[product_id] = requested.get(product_id, 0) + quantity
+            if product.stock < requested[product_id]:
                 transaction.set_rollback(True)
                 return Response(
-                    {"detail": f"Product with id {product_id} not found."},
+                    {"detail": f"Not enough stock for {product.name}."},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            if product.stock < quantity:
+            unit_price = product.price
+            total += unit_price * quantity
+            order_items.append(OrderItem(product=product, quantity=quantity, unit_price=unit_price))
+
+        # Decrement in the database rather than writing back a value read
+        # earlier; the stock condition makes the update a no-op (and the
+        # checkout fail) if another checkout got there first.
+        now = timezone.now()
+        for product_id in product_ids:
+            updated = Product.objects.filter(id=product_id, stock__gte=requested[product_id]).update(
+                stock=F("stock") - requested[product_id], updated_at=now
+            )
+            if not updated:
                 transaction.set_rollback(True)
                 return Response(
-                    {"detail": f"Not enough stock for {product.name}."},
+                    {"detail": f"Not enough stock for {products[product_id].name}."},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            unit_price = product.price
-            line_total = unit_price * quantity
-
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                quantity=quantity,
-                unit_price=unit_price,
+        order = Order.objects.create(
+            user=user,
+            customer_name=customer_name,
+            customer_email=customer_email,
+            status="pending",
+            total_price=total,
+        )
+        for order_item in order_items:
+            order_item.order = order
+        OrderItem.objects.bulk_create(order_items)
+        # While the rows are still locked, so concurrent checkouts can't
+        # write their documents out of order.
+        refresh_documents(product_ids)
+        # The locked rows give the new stock without reading it back.
+        publish({"id": pid, "stock": products[pid].stock - requested[pid]} for pid in product_ids)
+
+        # Stock is part of the cached catalog payloads, and the queryset
+        # update above doesn't send post_save.
+        transaction.on_commit(bump_catalog_version)
+
+    return order_created(request, order)
+
+
+def order_created(request, order):
+    # Reload with items prefetched so the response doesn't query per line.
+    order = order_queryset(expand=wants_expanded_orders(request)).get(pk=order.pk)
+    serializer = order_serializer_class(request)(order, context={"request": request})
+    with measure("serialize"):
+        data = serializer.data
+    return Response(data, status=status.HTTP_201_CREATED)
+
+
+def reserved_checkout(request, inventory, user, lines, customer_name, customer_email):
+    """Checkout against the inventory backend's counters (store/inventory.py).
+
+    No product row is locked or written: the units are held in the backend
+    while the order is inserted, and the reconciler moves committed sales to
+    Product.stock later.
+    """
+    products = Product.objects.filter(id__in={product_id for product_id, _ in lines}, is_active=True)
+    products = {product.id: product for product in products.only("id", "name", "price")}
+    requested = {}
+    for product_id, quantity in lines:
+        if product_id not in products:
+            return Response(
+                {"detail": f"Product with id {product_id} not found."},
+                status=status.HTTP_400_BAD_REQUEST,
             )
+        requested[product_id] = requested.get(product_id, 0) + quantity
 
-            product.stock -= quantity
-            product.save()
-
-            total += line_total
-
-        order.total_price = total
-        order.save()
+    try:
+        hold = inventory.reserve(requested)
+    except OutOfStock as exc:
+        return Response(
+            {"detail": f"Not enough stock for {products[exc.product_id].name}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
 
-    serializer = OrderSerializer(order)
-    return Response(serializer.data, status=status.HTTP_201_CREATED)
+    try:
+        with transaction.atomic():
+            order_items = [
+                OrderItem(product=products[product_id], quantity=quantity, unit_price=products[product_id].price)
+                for product_id, quantity in lines
+            ]
+            order = Order.objects.create(
+                user=user,
+                customer_name=customer_name,
+                customer_email=customer_email,
+                status="pending",
+                total_price=sum((item.unit_price * item.quantity for item in order_items), Decimal("0.00")),
+            )
+            for order_item in order_items:
+                order_item.order = order
+            OrderItem.objects.bulk_create(order_items)
+    except BaseException:
+        inventory.release(hold)
+        raise
+    inventory.commit(hold)
+    return order_created(request, order)
 
 
 @api_view(["POST"])
+@throttle_classes([AuthRateThrottle])
 def register(request):
     serializer = RegisterSerializer(data=request.data)
     if serializer.is_valid():
@@ -181,6 +515,10 @@ def register(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class TokenObtainView(TokenObtainPairView):
+    throttle_classes = [AuthRateThrottle]
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def me(request):
@@ -191,6 +529,32 @@ def me(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def my_orders(request):
-    orders = Order.objects.filter(user=request.user).order_by("-created_at")
-    serializer = OrderSerializer(orders, many=True)
-    return Response(serializer.data)
+    return paginated_orders(request, user_id=request.user.pk)
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+@renderer_classes([NDJSONRenderer, CSVRenderer])
+def order_export(request):
+    return streaming_export(request, "orders", export_orders)
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+@renderer_classes([NDJSONRenderer, CSVRenderer])
+def product_export(request):
+    return streaming_export(request, "products", export_products)
+
+
+def streaming_export(request, name, export):
+    """Stream `export` in the negotiated format, filtered by ?since=/?until=."""
+    renderer = request.accepted_renderer
+    try:
+        since, until = parse_range(request.query_params.get("since"), request.query_params.get("until"))
+    except ValueError as exc:
+        return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    chunks = export(renderer.format, since=since, until=until)
+    response = StreamingHttpResponse(chunks, content_type=f"{renderer.media_type}; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{name}.{renderer.format}"'
+    response["Cache-Control"] = "no-store"
+    return response